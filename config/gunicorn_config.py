@@ -1,3 +1,5 @@
+import os
+
 # https://docs.gunicorn.org/en/stable/settings.html
 bind = "0.0.0.0:8080"
 # Enable prints to be shown immediately
@@ -7,5 +9,10 @@ capture_output = True
 enable_stdio_inheritance = True
 
 workers = 2
-threads = 1
+# Clients come from a thread-safe checkout pool (src/utils/google_sheets.py),
+# so a worker can serve several requests at once. Opt in with
+# GUNICORN_WORKER_CLASS=gthread and GUNICORN_THREADS=4 (or gevent) after
+# measuring with scripts/load_test.py.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
 timeout = 360
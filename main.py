@@ -6,6 +6,7 @@ os.environ['CRYPTOGRAPHY_USE_PURE_PYTHON'] = '1'
 import traceback
 from flask import Flask
 from workflows_cdk import Router
+from src.utils.google_sheets import release_sheets_services
 
 # Test hash algorithm compatibility early
 try:
@@ -26,5 +27,8 @@ except Exception as e:
 app = Flask(__name__)
 router = Router(app)
 
+# Return per-request Sheets clients to the shared pool
+app.teardown_appcontext(release_sheets_services)
+
 if __name__ == "__main__":
     router.run_app(app)
\ No newline at end of file
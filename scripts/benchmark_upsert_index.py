@@ -0,0 +1,134 @@
+"""
+Bytes transferred and peak RSS for building the UPSERT key index, reading
+the whole sheet (before) against the header row plus key column (after).
+
+    # Synthetic sheet, no credentials needed
+    python scripts/benchmark_upsert_index.py --rows 50000 --columns 30
+    # A real sheet, through the connector's own Sheets client
+    python scripts/benchmark_upsert_index.py --spreadsheet-id ID --sheet-name Sheet1 --key-column Email
+
+Each variant runs in its own process so peak RSS is not shared between them.
+"""
+import os
+import sys
+import json
+import argparse
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--columns", type=int, default=30)
+    parser.add_argument("--spreadsheet-id")
+    parser.add_argument("--sheet-name", default="Sheet1")
+    parser.add_argument("--key-column", default="col_0")
+    parser.add_argument("--variant", choices=("before", "after"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def peak_rss_kb():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def index_from_whole_sheet(sheet_data, key_column):
+    # The old path: every cell of the sheet, then the key column
+    headers = sheet_data[0]
+    key_idx = headers.index(key_column)
+    key_to_row = {}
+    for idx, row in enumerate(sheet_data[1:], start=2):
+        if len(row) > key_idx:
+            key_val = str(row[key_idx]).strip()
+            if key_val and key_val != key_column:
+                key_to_row[key_val] = idx
+    return key_to_row
+
+
+def synthetic_responses(variant, rows, columns):
+    """
+    Response bodies shaped like the values.get calls each variant makes
+    """
+    headers = [f"col_{i}" for i in range(columns)]
+    if variant == "before":
+        values = [headers] + [[f"r{r}c{c}" for c in range(columns)] for r in range(rows)]
+        yield json.dumps({"range": "Sheet1!A1:ZZ", "majorDimension": "ROWS", "values": values}).encode()
+    else:
+        yield json.dumps({"values": [headers]}).encode()
+        yield json.dumps({"values": [[f"r{r}c0" for r in range(rows)]]}).encode()
+
+
+def run_synthetic(variant, args):
+    from src.modules.UPSERT.v1.route import build_key_index
+    baseline = peak_rss_kb()
+    transferred = 0
+    bodies = synthetic_responses(variant, args.rows, args.columns)
+    if variant == "before":
+        body = next(bodies)
+        transferred += len(body)
+        index = index_from_whole_sheet(json.loads(body)["values"], args.key_column)
+    else:
+        header_body = next(bodies)
+        transferred += len(header_body)
+        headers = json.loads(header_body)["values"][0]
+        headers.index(args.key_column)
+        key_body = next(bodies)
+        transferred += len(key_body)
+        index = build_key_index(json.loads(key_body)["values"][0], args.key_column)
+    return transferred, peak_rss_kb() - baseline, len(index)
+
+
+def run_live(variant, args):
+    from src.utils.google_sheets import get_google_sheets_service
+    from src.modules.UPSERT.v1.route import load_key_index
+    service = get_google_sheets_service(readonly=True)
+    http = service._http
+    counted = {"bytes": 0}
+    send = http.request
+
+    def counting_request(*request_args, **request_kwargs):
+        response, content = send(*request_args, **request_kwargs)
+        counted["bytes"] += len(content or b"")
+        return response, content
+
+    http.request = counting_request
+    baseline = peak_rss_kb()
+    if variant == "before":
+        result = service.spreadsheets().values().get(
+            spreadsheetId=args.spreadsheet_id, range=args.sheet_name
+        ).execute()
+        index = index_from_whole_sheet(result.get("values", []), args.key_column)
+    else:
+        index = load_key_index(service, args.spreadsheet_id, args.sheet_name, args.key_column).key_to_row
+    return counted["bytes"], peak_rss_kb() - baseline, len(index)
+
+
+def main():
+    args = parse_args()
+    if args.variant:
+        run = run_live if args.spreadsheet_id else run_synthetic
+        transferred, rss_kb, keys = run(args.variant, args)
+        print(json.dumps({"bytes": transferred, "peak_rss_kb": rss_kb, "keys": keys}))
+        return
+    results = {}
+    for variant in ("before", "after"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--variant", variant] + sys.argv[1:],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[variant] = json.loads(output.strip().splitlines()[-1])
+    source = f"spreadsheet {args.spreadsheet_id}" if args.spreadsheet_id else f"{args.rows} rows x {args.columns} columns"
+    print(f"UPSERT key index, {source}")
+    for variant in ("before", "after"):
+        result = results[variant]
+        print(f"  {variant:<6}  {result['bytes'] / 1024:>10.1f} KiB transferred  "
+              f"{result['peak_rss_kb'] / 1024:>8.1f} MiB peak RSS growth  {result['keys']} keys")
+    if results["after"]["bytes"]:
+        print(f"  bytes ratio before/after: {results['before']['bytes'] / results['after']['bytes']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Concurrent load against a running connector, to compare gunicorn settings.
+
+    GUNICORN_WORKER_CLASS=sync ./run_dev.sh        # then:
+    python scripts/load_test.py --spreadsheet-id ID --sheet-name Sheet1 --concurrency 16
+    GUNICORN_WORKER_CLASS=gthread GUNICORN_THREADS=4 ./run_dev.sh
+    python scripts/load_test.py --spreadsheet-id ID --sheet-name Sheet1 --concurrency 16
+
+Reports throughput and latency percentiles; only the standard library is used.
+"""
+import json
+import time
+import argparse
+import statistics
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:2003")
+    parser.add_argument("--module", default="GET", help="module whose /v1/execute route is called")
+    parser.add_argument("--spreadsheet-id", required=True)
+    parser.add_argument("--sheet-name", default="Sheet1")
+    parser.add_argument("--range", default="A1:Z100")
+    parser.add_argument("--form-data", help="JSON form_data, overriding the read built from the options above")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    return parser.parse_args()
+
+
+def send(url, body):
+    started = time.perf_counter()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=360) as response:
+            ok = json.loads(response.read()).get("metadata", {}).get("status") == "success"
+    except Exception:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def main():
+    args = parse_args()
+    form_data = json.loads(args.form_data) if args.form_data else {
+        "spreadsheet_id": args.spreadsheet_id,
+        "sheet_name": args.sheet_name,
+        "range": args.range,
+        # Keep answers from being served out of the read cache
+        "cache_ttl": 0
+    }
+    url = f"{args.base_url.rstrip('/')}/{args.module}/v1/execute"
+    body = json.dumps({"form_data": form_data}).encode()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda _: send(url, body), range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, ok in results if not ok)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {failures} failed")
+    print(f"throughput  {args.requests / elapsed:.1f} req/s over {elapsed:.1f}s")
+    print(f"latency     p50 {quantiles[49] * 1000:.0f}ms  p95 {quantiles[94] * 1000:.0f}ms  "
+          f"max {latencies[-1] * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# This file makes the BATCH v1 directory a Python package
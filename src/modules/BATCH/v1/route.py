@@ -0,0 +1,364 @@
+# Set environment variables BEFORE any imports to prevent PyO3 conflicts
+import os
+os.environ['CRYPTOGRAPHY_DONT_BUILD_RUST'] = '1'
+os.environ['CRYPTOGRAPHY_USE_PURE_PYTHON'] = '1'
+
+from workflows_cdk import Response, Request, Router
+from flask import request as flask_request
+import json
+import logging
+import traceback
+
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.google_sheets import get_google_sheets_service, column_letter, parse_a1_range, quote_sheet_name
+from src.utils.key_index_cache import key_index_cache
+from src.utils.retry import classify_exception
+from src.utils.row_intervals import RowShift, parse_row_numbers, merge_row_intervals, count_rows
+from src.utils.sheet_metadata import metadata_cache
+from src.utils.write_hooks import notify_spreadsheet_written
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Create router instance
+router = Router()
+
+OPERATION_TYPES = ["insert", "update", "upsert", "delete"]
+MAX_OPERATIONS = 500
+# Requests are split across spreadsheets.batchUpdate calls above this size
+MAX_BATCH_PAYLOAD_BYTES = 2 * 1024 * 1024
+
+
+def parse_operations(operations_raw):
+    if isinstance(operations_raw, str):
+        try:
+            operations_raw = json.loads(operations_raw)
+        except json.JSONDecodeError:
+            raise ValueError("operations must be a JSON array")
+    if not isinstance(operations_raw, list) or not operations_raw:
+        raise ValueError("operations must be a non-empty array")
+    if len(operations_raw) > MAX_OPERATIONS:
+        raise ValueError(f"At most {MAX_OPERATIONS} operations per batch")
+    for index, operation in enumerate(operations_raw):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {index} must be an object")
+        op = operation.get("op")
+        if op not in OPERATION_TYPES:
+            raise ValueError(f"Operation {index}: op must be one of: {', '.join(OPERATION_TYPES)}")
+        if not operation.get("sheet_name"):
+            raise ValueError(f"Operation {index}: sheet_name is required")
+        if op in ("insert", "upsert"):
+            rows = operation.get("rows")
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError(f"Operation {index}: rows must be an array of objects")
+        if op == "upsert" and not operation.get("key_column"):
+            raise ValueError(f"Operation {index}: key_column is required for upsert")
+        if op == "update":
+            values = operation.get("values")
+            if not isinstance(values, list) or not all(isinstance(row, list) for row in values):
+                raise ValueError(f"Operation {index}: values must be a 2D array")
+            if not operation.get("range"):
+                raise ValueError(f"Operation {index}: range is required for update")
+        if op == "delete":
+            row_numbers = operation.get("row_numbers")
+            if isinstance(row_numbers, list):
+                row_numbers = ",".join(str(row) for row in row_numbers)
+            try:
+                operation["row_intervals"] = parse_row_numbers(str(row_numbers or ""))
+            except ValueError as e:
+                raise ValueError(f"Operation {index}: {e}")
+    return operations_raw
+
+
+def to_cell(value):
+    # RAW semantics: values are stored as given, never parsed as formulas or dates
+    if value is None or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def to_row_data(values):
+    return {"values": [to_cell(value) for value in values]}
+
+
+def load_key_indexes(service, spreadsheet_id, operations, headers_by_sheet):
+    """
+    Key -> row maps for every upsert, reading all uncached key columns in one values.batchGet
+    """
+    indexes = {}
+    to_read = []
+    for operation in operations:
+        if operation["op"] != "upsert":
+            continue
+        sheet_name, key_column = operation["sheet_name"], operation["key_column"]
+        if (sheet_name, key_column) in indexes:
+            continue
+        headers = headers_by_sheet[sheet_name]
+        if key_column not in headers:
+            raise ValueError(f"Key column '{key_column}' not found in sheet headers: {headers}")
+        cached = key_index_cache.get((spreadsheet_id, sheet_name, key_column))
+        if cached is not None:
+            indexes[(sheet_name, key_column)] = dict(cached.key_to_row)
+        else:
+            indexes[(sheet_name, key_column)] = None
+            to_read.append((sheet_name, key_column, headers.index(key_column)))
+    if to_read:
+        ranges = []
+        for sheet_name, _, key_idx in to_read:
+            letter = column_letter(key_idx + 1)
+            ranges.append(f"{quote_sheet_name(sheet_name)}!{letter}2:{letter}")
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            majorDimension='COLUMNS',
+            fields='valueRanges(values)'
+        ).execute()
+        for (sheet_name, key_column, _), value_range in zip(to_read, result.get('valueRanges', [])):
+            values = value_range.get('values', [])
+            key_to_row = {}
+            for row_number, value in enumerate(values[0] if values else [], start=2):
+                key = str(value).strip()
+                if key and key != key_column:
+                    key_to_row[key] = row_number
+            indexes[(sheet_name, key_column)] = key_to_row
+    return indexes
+
+
+def compile_operations(operations, sheet_ids, headers_by_sheet, key_indexes):
+    """
+    Turn the ordered operations into spreadsheets.batchUpdate requests.
+
+    Row numbers in every operation refer to the sheet as it was before the
+    batch; they are shifted past rows deleted by earlier operations. Rows
+    appended earlier in the batch have no row number until it runs, so an
+    upsert of one of their keys rewrites the pending appended row instead of
+    appending a duplicate. Returns (requests, results) with one result per
+    operation.
+    """
+    requests = []
+    results = []
+    shifts = {}
+    # sheet_name -> [(source object, row data)] appended so far in this batch
+    pending_rows = {}
+    # (sheet_name, key_column) -> (pending rows indexed, key -> row data)
+    pending_indexes = {}
+    for index, operation in enumerate(operations):
+        op = operation["op"]
+        sheet_name = operation["sheet_name"]
+        sheet_id = sheet_ids[sheet_name]
+        shift = shifts.setdefault(sheet_name, RowShift())
+        result = {"index": index, "op": op, "sheet_name": sheet_name}
+        if op == "insert":
+            if operation["rows"]:
+                # A tab without a header row takes its column order from the first object
+                headers = headers_by_sheet[sheet_name] or list(operation["rows"][0].keys())
+                rows = [to_row_data([row.get(h, "") for h in headers]) for row in operation["rows"]]
+                pending_rows.setdefault(sheet_name, []).extend(zip(operation["rows"], rows))
+                requests.append({"appendCells": {
+                    "sheetId": sheet_id,
+                    "rows": rows,
+                    "fields": "userEnteredValue"
+                }})
+            result["inserted"] = len(operation["rows"])
+        elif op == "update":
+            start_col, start_row, end_col, end_row = parse_a1_range(operation["range"])
+            start_col = start_col or 1
+            start_row = start_row or 1
+            values = operation["values"]
+            last_row = start_row + len(values) - 1
+            if end_row is not None and last_row > end_row:
+                raise ValueError(f"Operation {index}: {len(values)} rows do not fit in range {operation['range']}")
+            if values and shift.overlaps_deleted(start_row, last_row):
+                raise ValueError(f"Operation {index}: range {operation['range']} includes rows deleted earlier in the batch")
+            if values:
+                requests.append({"updateCells": {
+                    "start": {"sheetId": sheet_id, "rowIndex": shift.current_row(start_row) - 1, "columnIndex": start_col - 1},
+                    "rows": [to_row_data(row) for row in values],
+                    "fields": "userEnteredValue"
+                }})
+            result["updated_rows"] = len(values)
+        elif op == "upsert":
+            headers = headers_by_sheet[sheet_name]
+            key_column = operation["key_column"]
+            key_to_row = key_indexes[(sheet_name, key_column)]
+            pending = pending_rows.setdefault(sheet_name, [])
+            indexed, pending_keys = pending_indexes.get((sheet_name, key_column), (0, {}))
+            for source, row_data in pending[indexed:]:
+                pending_key = str(source.get(key_column, "")).strip()
+                if pending_key:
+                    pending_keys[pending_key] = row_data
+            append_rows = []
+            updated = 0
+            for row in operation["rows"]:
+                key = str(row.get(key_column, "")).strip()
+                values = [row.get(h, "") for h in headers]
+                row_number = key_to_row.get(key)
+                current = shift.current_row(row_number) if row_number is not None else None
+                if current is None and key in pending_keys:
+                    # Appended earlier in this batch: the pending row takes the new values
+                    pending_keys[key]["values"] = to_row_data(values)["values"]
+                    updated += 1
+                    continue
+                if current is None:
+                    row_data = to_row_data(values)
+                    append_rows.append(row_data)
+                    pending.append((row, row_data))
+                    if key:
+                        pending_keys[key] = row_data
+                    continue
+                requests.append({"updateCells": {
+                    "start": {"sheetId": sheet_id, "rowIndex": current - 1, "columnIndex": 0},
+                    "rows": [to_row_data(values)],
+                    "fields": "userEnteredValue"
+                }})
+                updated += 1
+            pending_indexes[(sheet_name, key_column)] = (len(pending), pending_keys)
+            if append_rows:
+                requests.append({"appendCells": {"sheetId": sheet_id, "rows": append_rows, "fields": "userEnteredValue"}})
+            result["updated"] = updated
+            result["inserted"] = len(append_rows)
+        else:
+            intervals = operation["row_intervals"]
+            current_intervals = shift.delete(intervals)
+            for start_row, end_row in current_intervals:
+                requests.append({"deleteDimension": {"range": {
+                    "sheetId": sheet_id,
+                    "dimension": "ROWS",
+                    "startIndex": start_row - 1,
+                    "endIndex": end_row
+                }}})
+            result["deleted_row_ranges"] = [[start_row, end_row] for start_row, end_row in merge_row_intervals(intervals)]
+            result["deleted_rows_count"] = count_rows(current_intervals)
+        results.append(result)
+    return requests, results
+
+
+def chunk_requests(requests, max_bytes=MAX_BATCH_PAYLOAD_BYTES):
+    chunk = []
+    chunk_bytes = 0
+    for request in requests:
+        size = len(json.dumps(request))
+        if chunk and chunk_bytes + size > max_bytes:
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(request)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+@router.route("/execute", methods=["GET", "POST"])
+def execute():
+    """
+    Run an ordered list of insert, update, upsert and delete operations
+    against one spreadsheet in as few spreadsheets.batchUpdate calls as possible
+    """
+    logger.info("=== BATCH WRITE EXECUTE START ===")
+    try:
+        request = Request(flask_request)
+        data = request.data
+        form_data = data.get("form_data", data)
+        spreadsheet_id = form_data.get("spreadsheet_id")
+        confirm_batch = form_data.get("confirm_batch", False)
+        if not spreadsheet_id:
+            return Response(data={"error": "Spreadsheet ID is required"}, metadata={"status": "error"})
+        if not confirm_batch:
+            return Response(data={"error": "You must confirm the batch by checking the confirmation box"}, metadata={"status": "error"})
+        try:
+            operations = parse_operations(form_data.get("operations"))
+        except ValueError as e:
+            return Response(data={"error": f"Invalid operations: {str(e)}"}, metadata={"status": "error"})
+        circuit = circuit_breaker.check(spreadsheet_id)
+        if circuit:
+            logger.error(f"Circuit open for spreadsheet {spreadsheet_id}: {circuit['reason']}")
+            return Response(data={"error": circuit["message"], "circuit": circuit}, metadata={"status": "error", "circuit_state": circuit["state"]})
+
+        try:
+            service = get_google_sheets_service()
+            sheet_names = list(dict.fromkeys(operation["sheet_name"] for operation in operations))
+            sheet_ids = {name: metadata_cache.get_sheet_id(service, spreadsheet_id, name) for name in sheet_names}
+            headers_by_sheet = {
+                name: metadata_cache.get_headers(service, spreadsheet_id, name)
+                for name in dict.fromkeys(op["sheet_name"] for op in operations if op["op"] in ("insert", "upsert"))
+            }
+            key_indexes = load_key_indexes(service, spreadsheet_id, operations, headers_by_sheet)
+            requests, results = compile_operations(operations, sheet_ids, headers_by_sheet, key_indexes)
+        except ValueError as e:
+            return Response(data={"error": str(e)}, metadata={"status": "error"})
+        except Exception as e:
+            logger.error(f"Failed to prepare batch: {e}")
+            error_class = classify_exception(e)
+            return Response(
+                data={"error": f"Failed to prepare batch: {str(e)}", "error_class": error_class},
+                metadata={"status": "error", "error_class": error_class}
+            )
+
+        # Every write depends on row positions, so cached indexes and sizes go first
+        key_index_cache.invalidate_spreadsheet(spreadsheet_id)
+        calls = 0
+        try:
+            for chunk in chunk_requests(requests):
+                service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={"requests": chunk}
+                ).execute()
+                calls += 1
+        except Exception as e:
+            logger.error(f"Batch write failed after {calls} calls: {e}")
+            error_class = classify_exception(e)
+            return Response(
+                data={
+                    "error": f"Failed to apply batch: {str(e)}",
+                    "error_class": error_class,
+                    # Each call is atomic; earlier calls were applied in full
+                    "applied_calls": calls,
+                    "operations": results
+                },
+                metadata={"status": "error", "error_class": error_class, "applied_calls": calls}
+            )
+        finally:
+            metadata_cache.invalidate(spreadsheet_id)
+            notify_spreadsheet_written(spreadsheet_id)
+
+        logger.info(f"=== BATCH WRITE SUCCESS: {len(operations)} operations in {calls} calls ===")
+        return Response(
+            data={
+                "message": f"Applied {len(operations)} operations in {calls} API calls",
+                "operations": results,
+                "spreadsheet_id": spreadsheet_id
+            },
+            metadata={
+                "status": "success",
+                "spreadsheet_id": spreadsheet_id,
+                "operation_count": len(operations),
+                "request_count": len(requests),
+                "api_calls": calls
+            }
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in execute function: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return Response(
+            data={"error": f"Unexpected error: {str(e)}"},
+            metadata={"status": "error"}
+        )
+
+
+@router.route("/content", methods=["GET", "POST"])
+def content():
+    """
+    Return content for the module (not used for BATCH module)
+    """
+    return Response(
+        data={
+            "message": "BATCH module content endpoint",
+            "description": "This endpoint is not used for the BATCH module"
+        },
+        metadata={"status": "success"}
+    )
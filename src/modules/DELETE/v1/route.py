@@ -16,7 +16,14 @@ import json
 import logging
 import traceback
 import re
-from src.utils.google_sheets import get_google_sheets_service
+from src.utils.google_sheets import get_google_sheets_service, sheets_service
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.key_index_cache import key_index_cache
+from src.utils.sheet_metadata import metadata_cache
+from src.utils.row_intervals import parse_row_numbers, count_rows
+from src.utils.write_hooks import notify_spreadsheet_written
+from src.utils.retry import classify_exception, describe_error, ERROR_DESCRIPTIONS
+from src.utils.write_jobs import register_job_runner, submit_job, job_accepted_response
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -30,92 +37,121 @@ SERVICE_ACCOUNT_FILE = "/usr/src/app/quail-asset-7c70b02f0362.json"
 # Create router instance
 router = Router()
 
+# deleteDimension requests per spreadsheets.batchUpdate call. A selection
+# that fits is deleted in one atomic call; larger ones are split and can
+# fail part way, see PartialDeleteError.
+MAX_REQUESTS_PER_BATCH = int(os.environ.get("SHEETS_DELETE_MAX_REQUESTS", "10000"))
 
-def parse_row_numbers(row_numbers_str):
+
+class PartialDeleteError(Exception):
     """
-    Parse row numbers string into a list of row numbers to delete.
-    Supports formats like: "5", "5-10", "5,7,10-12"
+    A later batchUpdate failed after earlier ones were applied. Batches run
+    bottom-up, so the applied and remaining ranges keep their original row
+    numbers and the remaining ones can be retried as they are.
     """
-    try:
-        if not row_numbers_str or not row_numbers_str.strip():
-            raise ValueError("Row numbers string is empty")
-        row_numbers = []
-        parts = row_numbers_str.strip().split(',')
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            if '-' in part:
-                try:
-                    start, end = part.split('-', 1)
-                    start_row = int(start.strip())
-                    end_row = int(end.strip())
-                    if start_row > end_row:
-                        raise ValueError(f"Invalid range: {part} (start > end)")
-                    if start_row < 1:
-                        raise ValueError(f"Invalid row number: {start_row} (must be >= 1)")
-                    row_numbers.extend(range(start_row, end_row + 1))
-                except ValueError as e:
-                    raise ValueError(f"Invalid range format: {part}. Use format like '5-10'")
-            else:
-                try:
-                    row_num = int(part)
-                    if row_num < 1:
-                        raise ValueError(f"Invalid row number: {row_num} (must be >= 1)")
-                    row_numbers.append(row_num)
-                except ValueError as e:
-                    raise ValueError(f"Invalid row number: {part}. Must be a valid integer")
-        row_numbers = sorted(list(set(row_numbers)))
-        if not row_numbers:
-            raise ValueError("No valid row numbers found")
-        return row_numbers
-    except Exception as e:
-        logger.error(f"Error parsing row numbers: {e}")
-        raise
 
-def delete_rows_from_sheet(service, spreadsheet_id, sheet_name, row_numbers):
+    def __init__(self, error, applied_intervals, remaining_intervals, batches_applied, batches_total):
+        super().__init__(str(error))
+        self.error = error
+        self.applied_intervals = applied_intervals
+        self.remaining_intervals = remaining_intervals
+        self.batches_applied = batches_applied
+        self.batches_total = batches_total
+
+
+def expand_row_intervals(row_intervals):
+    # The per-row list callers received before deletes were ranged
+    return [row for start_row, end_row in row_intervals for row in range(start_row, end_row + 1)]
+
+
+def delete_rows_from_sheet(service, spreadsheet_id, sheet_name, row_intervals, report_progress=None):
     """
-    Delete specific rows from a Google Sheet
+    Delete row intervals from a Google Sheet, one ranged deleteDimension per
+    contiguous run, bottom-up so earlier deletions do not shift later ones
     """
+    # Row numbers shift after a delete, so cached UPSERT key indexes are stale
+    key_index_cache.invalidate_spreadsheet(spreadsheet_id)
     try:
         # First, get the sheet ID
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheet_id = None
-        for sheet in spreadsheet.get('sheets', []):
-            if sheet['properties']['title'] == sheet_name:
-                sheet_id = sheet['properties']['sheetId']
-                break
-        if sheet_id is None:
-            raise ValueError(f"Sheet '{sheet_name}' not found in spreadsheet")
-        row_numbers_desc = sorted(row_numbers, reverse=True)
+        sheet_id = metadata_cache.get_sheet_id(service, spreadsheet_id, sheet_name)
         requests = []
-        for row_num in row_numbers_desc:
-            row_index = row_num - 1
+        intervals_desc = sorted(row_intervals, reverse=True)
+        for start_row, end_row in intervals_desc:
             request = {
                 "deleteDimension": {
                     "range": {
                         "sheetId": sheet_id,
                         "dimension": "ROWS",
-                        "startIndex": row_index,
-                        "endIndex": row_index + 1
+                        "startIndex": start_row - 1,
+                        "endIndex": end_row
                     }
                 }
             }
             requests.append(request)
-        body = {
-            "requests": requests
-        }
-        result = service.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body=body
-        ).execute()
+        result = None
+        batches_total = (len(requests) + MAX_REQUESTS_PER_BATCH - 1) // MAX_REQUESTS_PER_BATCH
+        rows_deleted = 0
+        for offset in range(0, len(requests), MAX_REQUESTS_PER_BATCH):
+            body = {
+                "requests": requests[offset:offset + MAX_REQUESTS_PER_BATCH]
+            }
+            try:
+                result = service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body=body
+                ).execute()
+            except Exception as batch_error:
+                if offset == 0:
+                    raise
+                raise PartialDeleteError(
+                    batch_error,
+                    sorted(intervals_desc[:offset]),
+                    sorted(intervals_desc[offset:]),
+                    offset // MAX_REQUESTS_PER_BATCH,
+                    batches_total
+                ) from batch_error
+            rows_deleted += sum(
+                r["deleteDimension"]["range"]["endIndex"] - r["deleteDimension"]["range"]["startIndex"]
+                for r in body["requests"]
+            )
+            if report_progress is not None:
+                report_progress({
+                    "batches_done": offset // MAX_REQUESTS_PER_BATCH + 1,
+                    "batches_total": batches_total,
+                    "rows_deleted": rows_deleted
+                })
+        metadata_cache.note_rows_deleted(spreadsheet_id, sheet_name, count_rows(row_intervals))
+        notify_spreadsheet_written(spreadsheet_id)
         return result
     except Exception as e:
+        # Cached sheetIds / grid sizes may be what went wrong, and a partial
+        # delete leaves the row counts unknown
+        metadata_cache.invalidate(spreadsheet_id)
+        notify_spreadsheet_written(spreadsheet_id)
         logger.error(f"Error deleting rows: {e}")
         logger.error(f"Error type: {type(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+def run_delete_job(payload, report_progress):
+    """
+    Background runner for async_mode deletes
+    """
+    row_intervals = [tuple(interval) for interval in payload["row_intervals"]]
+    with sheets_service() as service:
+        delete_rows_from_sheet(service, payload["spreadsheet_id"], payload["sheet_name"], row_intervals, report_progress)
+    deleted_count = count_rows(row_intervals)
+    return {
+        "message": f"Successfully deleted {deleted_count} rows",
+        "deleted_rows": expand_row_intervals(row_intervals),
+        "deleted_row_ranges": [[start_row, end_row] for start_row, end_row in row_intervals],
+        "deleted_rows_count": deleted_count,
+        "spreadsheet_id": payload["spreadsheet_id"],
+        "sheet_name": payload["sheet_name"]
+    }
+
+register_job_runner("DELETE", run_delete_job)
+
 @router.route("/execute", methods=["GET", "POST"])
 def execute():
     """
@@ -130,6 +166,7 @@ def execute():
         sheet_name = form_data.get("sheet_name")
         row_numbers_str = form_data.get("row_numbers", "")
         confirm_deletion = form_data.get("confirm_deletion", False)
+        async_mode = form_data.get("async_mode", False)
         # Validate required fields
         if not spreadsheet_id:
             logger.error("Spreadsheet ID is missing")
@@ -156,56 +193,80 @@ def execute():
                 metadata={"status": "error"}
             )
         try:
-            row_numbers = parse_row_numbers(row_numbers_str)
+            row_intervals = parse_row_numbers(row_numbers_str)
         except ValueError as e:
             logger.error(f"Invalid row numbers format: {e}")
             return Response(
                 data={"error": f"Invalid row numbers format: {str(e)}"},
                 metadata={"status": "error"}
             )
+        circuit = circuit_breaker.check(spreadsheet_id)
+        if circuit:
+            logger.error(f"Circuit open for spreadsheet {spreadsheet_id}: {circuit['reason']}")
+            return Response(
+                data={"error": circuit["message"], "circuit": circuit},
+                metadata={"status": "error", "circuit_state": circuit["state"]}
+            )
+        if async_mode:
+            try:
+                job = submit_job("DELETE", {
+                    "spreadsheet_id": spreadsheet_id,
+                    "sheet_name": sheet_name,
+                    "row_intervals": row_intervals
+                })
+            except Exception as job_error:
+                logger.error(f"Failed to queue delete job: {job_error}")
+                return Response(
+                    data={"error": f"Failed to queue delete job: {str(job_error)}"},
+                    metadata={"status": "error"}
+                )
+            return job_accepted_response(job)
         try:
             service = get_google_sheets_service()
         except Exception as service_error:
             logger.error(f"Failed to create Google Sheets service: {service_error}")
-            error_str = str(service_error).lower()
-            if "permission" in error_str or "unauthorized" in error_str or "403" in error_str:
-                logger.error("✗ ERROR TYPE: Permission/Authorization issue")
-            elif "quota" in error_str or "rate limit" in error_str or "429" in error_str:
-                logger.error("✗ ERROR TYPE: API quota/rate limit exceeded")
-            elif "network" in error_str or "connection" in error_str or "timeout" in error_str:
-                logger.error("✗ ERROR TYPE: Network connectivity issue")
-            elif "invalid" in error_str and "key" in error_str:
-                logger.error("✗ ERROR TYPE: Invalid service account credentials")
-            else:
-                logger.error("✗ ERROR TYPE: Unknown service creation error")
+            logger.error(f"✗ ERROR TYPE: {describe_error(service_error)}")
             return Response(
                 data={"error": f"Failed to create Google Sheets service: {str(service_error)}"},
                 metadata={"status": "error"}
             )
         try:
-            result = delete_rows_from_sheet(service, spreadsheet_id, sheet_name, row_numbers)
+            result = delete_rows_from_sheet(service, spreadsheet_id, sheet_name, row_intervals)
+        except PartialDeleteError as partial_error:
+            logger.error(
+                f"Delete failed after {partial_error.batches_applied} of {partial_error.batches_total} batches: {partial_error}"
+            )
+            error_class = classify_exception(partial_error.error)
+            deleted_count = count_rows(partial_error.applied_intervals)
+            return Response(
+                data={
+                    "error": f"Failed to delete rows from Google Sheet after {deleted_count} rows were deleted: {str(partial_error)}",
+                    "error_class": error_class,
+                    "partial": True,
+                    "deleted_row_ranges": [[start_row, end_row] for start_row, end_row in partial_error.applied_intervals],
+                    "deleted_rows_count": deleted_count,
+                    "remaining_row_ranges": [[start_row, end_row] for start_row, end_row in partial_error.remaining_intervals],
+                    "batches_applied": partial_error.batches_applied,
+                    "batches_total": partial_error.batches_total
+                },
+                metadata={"status": "error", "error_class": error_class, "partial": True}
+            )
         except Exception as delete_error:
             logger.error(f"Error deleting rows: {delete_error}")
-            error_str = str(delete_error).lower()
-            if "permission" in error_str or "unauthorized" in error_str or "403" in error_str:
-                logger.error("✗ ERROR TYPE: Spreadsheet permission issue")
-            elif "not found" in error_str or "404" in error_str:
-                logger.error("✗ ERROR TYPE: Spreadsheet or sheet not found")
-            elif "quota" in error_str or "rate limit" in error_str or "429" in error_str:
-                logger.error("✗ ERROR TYPE: API quota/rate limit exceeded")
-            elif "network" in error_str or "connection" in error_str or "timeout" in error_str:
-                logger.error("✗ ERROR TYPE: Network connectivity issue")
-            else:
-                logger.error("✗ ERROR TYPE: Unknown delete error")
+            error_class = classify_exception(delete_error)
+            logger.error(f"✗ ERROR TYPE: {ERROR_DESCRIPTIONS[error_class]}")
             return Response(
-                data={"error": f"Failed to delete rows from Google Sheet: {str(delete_error)}"},
-                metadata={"status": "error"}
+                data={"error": f"Failed to delete rows from Google Sheet: {str(delete_error)}", "error_class": error_class},
+                metadata={"status": "error", "error_class": error_class}
             )
         logger.info("=== DELETE ROWS SUCCESS ===")
+        deleted_count = count_rows(row_intervals)
         return Response(
             data={
-                "message": f"Successfully deleted {len(row_numbers)} rows",
-                "deleted_rows": row_numbers,
+                "message": f"Successfully deleted {deleted_count} rows",
+                "deleted_rows": expand_row_intervals(row_intervals),
+                "deleted_row_ranges": [[start_row, end_row] for start_row, end_row in row_intervals],
+                "deleted_rows_count": deleted_count,
                 "spreadsheet_id": spreadsheet_id,
                 "sheet_name": sheet_name
             },
@@ -213,7 +274,7 @@ def execute():
                 "status": "success",
                 "spreadsheet_id": spreadsheet_id,
                 "sheet_name": sheet_name,
-                "deleted_rows_count": len(row_numbers)
+                "deleted_rows_count": deleted_count
             }
         )
     except Exception as e:
@@ -5,8 +5,11 @@ os.environ['CRYPTOGRAPHY_USE_PURE_PYTHON'] = '1'
 
 from workflows_cdk import Response, Request, Router
 from flask import request as flask_request
+from flask import Response as FlaskResponse, stream_with_context
 import requests
 import json
+import base64
+import itertools
 import logging
 import traceback
 
@@ -28,7 +31,203 @@ from googleapiclient.discovery import build
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
 
-from src.utils.google_sheets import get_google_sheets_service
+from src.utils.change_tracker import compute_changes
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.async_sheets import get_async_client, ASYNC_CLIENT_ENABLED
+from src.utils.fan_out import iter_fan_out, iter_fan_out_async, FANOUT_TARGET_TIMEOUT_SECONDS, MAX_FANOUT_TARGETS
+from src.utils.google_sheets import get_google_sheets_service, sheets_service, column_letter, parse_a1_range, quote_sheet_name
+from src.utils.output_formats import (
+    OUTPUT_FORMATS, STREAMABLE_FORMATS, VALUE_RENDER_OPTIONS, CSV_MIMETYPE, ARROW_MIMETYPE, NDJSON_MIMETYPE,
+    iter_csv, to_columnar, to_arrow_ipc
+)
+from src.utils.read_cache import read_cache
+from src.utils.row_filters import RowSelector, parse_columns, parse_filters
+from src.utils.sheet_metadata import metadata_cache
+
+# Rows fetched per values().get() call in streaming mode
+DEFAULT_PAGE_SIZE = 5000
+MAX_PAGE_SIZE = 50000
+DEFAULT_VALUE_RENDER_OPTION = "FORMATTED_VALUE"
+
+
+def encode_cursor(full_range, offset):
+    payload = json.dumps({"range": full_range, "offset": offset}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor, full_range):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("range") != full_range:
+        raise ValueError("Cursor does not belong to this sheet and range")
+    return int(payload.get("offset", 0))
+
+
+def parse_ranges(ranges_raw):
+    """
+    Parse the multi-range input into full A1 ranges. Accepts a JSON string or a
+    list whose items are either A1 strings ("Sheet1!A1:D10", "Sheet2") or
+    objects with "sheet_name" and an optional "range".
+    """
+    if isinstance(ranges_raw, str):
+        try:
+            ranges_raw = json.loads(ranges_raw)
+        except json.JSONDecodeError:
+            raise ValueError("ranges must be a JSON array")
+    if not isinstance(ranges_raw, list) or not ranges_raw:
+        raise ValueError("ranges must be a non-empty array")
+    full_ranges = []
+    for item in ranges_raw:
+        if isinstance(item, str) and item.strip():
+            full_ranges.append(item.strip())
+        elif isinstance(item, dict) and item.get("sheet_name"):
+            range_str = (item.get("range") or "").strip()
+            full_ranges.append(f"{item['sheet_name']}!{range_str}" if range_str else item["sheet_name"])
+        else:
+            raise ValueError(f"Invalid range entry: {item}")
+    return full_ranges
+
+
+def parse_fan_out_targets(form_data):
+    """
+    Targets for a fan-out read: either `targets`, a JSON array of objects with
+    spreadsheet_id and optional sheet_name/range, or `spreadsheet_ids`, a JSON
+    array or comma-separated list. sheet_name and range default to the form's.
+    """
+    default_sheet = form_data.get("sheet_name")
+    default_range = form_data.get("range", "")
+    targets_raw = form_data.get("targets")
+    if targets_raw:
+        if isinstance(targets_raw, str):
+            try:
+                targets_raw = json.loads(targets_raw)
+            except json.JSONDecodeError:
+                raise ValueError("targets must be a JSON array")
+        if not isinstance(targets_raw, list) or not all(isinstance(t, dict) for t in targets_raw):
+            raise ValueError("targets must be an array of objects")
+    else:
+        ids_raw = form_data.get("spreadsheet_ids")
+        if isinstance(ids_raw, str):
+            ids_raw = json.loads(ids_raw) if ids_raw.strip().startswith('[') else ids_raw.split(',')
+        if not isinstance(ids_raw, list):
+            raise ValueError("spreadsheet_ids must be an array")
+        targets_raw = [{"spreadsheet_id": str(sid).strip()} for sid in ids_raw if str(sid).strip()]
+    if not targets_raw:
+        raise ValueError("At least one target spreadsheet is required")
+    if len(targets_raw) > MAX_FANOUT_TARGETS:
+        raise ValueError(f"At most {MAX_FANOUT_TARGETS} targets per fan-out read")
+    targets = []
+    for target in targets_raw:
+        spreadsheet_id = target.get("spreadsheet_id")
+        sheet_name = target.get("sheet_name") or default_sheet
+        if not spreadsheet_id or not sheet_name:
+            raise ValueError(f"Each target needs a spreadsheet_id and a sheet_name: {target}")
+        range_str = (target.get("range") if target.get("range") is not None else default_range) or ""
+        full_range = f"{sheet_name}!{range_str.strip()}" if range_str.strip() else sheet_name
+        targets.append({"spreadsheet_id": spreadsheet_id, "range": full_range})
+    return targets
+
+
+def batch_get_values(service, spreadsheet_id, full_ranges, include_headers, value_render_option=DEFAULT_VALUE_RENDER_OPTION):
+    result = service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=full_ranges,
+        valueRenderOption=value_render_option,
+        fields='valueRanges(values)'
+    ).execute()
+    value_ranges = result.get('valueRanges', [])
+    results = {}
+    # valueRanges come back in request order, with normalized range names
+    for full_range, value_range in zip(full_ranges, value_ranges):
+        values = value_range.get('values', [])
+        if not include_headers and values:
+            del values[0]
+        results[full_range] = values
+    return results
+
+
+def read_row_windows(service, spreadsheet_id, sheet_name, range_str, offset, limit, page_size, include_header, state,
+                     value_render_option=DEFAULT_VALUE_RENDER_OPTION):
+    """
+    Yield the header row (optionally) and then data rows of a range, fetching
+    `page_size` rows per API call so only one window is in memory at a time.
+    The header is the first row of the range, as in the non-streaming read.
+    `offset` and `limit` count sheet rows below the header; state["next_offset"]
+    and state["exhausted"] are updated as rows are consumed.
+
+    Grid size is re-read rather than taken from the metadata cache: appends
+    from INSERT/UPSERT/BATCH grow the sheet without touching the cache, and a
+    stale row count would end the read early with no continuation cursor.
+    """
+    properties = metadata_cache.get_sheet_properties(service, spreadsheet_id, sheet_name, force_refresh=True)
+    start_col, start_row, end_col, end_row = parse_a1_range(range_str) if range_str else (None, None, None, None)
+    start_col = start_col or 1
+    end_col = end_col or max(properties["column_count"], start_col)
+    header_row = start_row or 1
+    last_row = min(end_row or properties["row_count"], properties["row_count"])
+
+    def fetch(first, last):
+        window = f"{quote_sheet_name(sheet_name)}!{column_letter(start_col)}{first}:{column_letter(end_col)}{last}"
+        result = service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=window,
+            valueRenderOption=value_render_option,
+            fields='values'
+        ).execute()
+        return result.get('values', [])
+
+    if include_header:
+        header = fetch(header_row, header_row)
+        yield header[0] if header else []
+    row_number = header_row + 1 + offset
+    stop_row = last_row if limit is None else min(last_row, row_number + limit - 1)
+    # values().get() omits trailing empty rows; they are only emitted once a
+    # later non-empty row shows they are interior gaps rather than the end
+    pending_empty = 0
+    while row_number <= stop_row:
+        window_end = min(row_number + page_size - 1, stop_row)
+        rows = fetch(row_number, window_end)
+        if rows:
+            for _ in range(pending_empty):
+                yield []
+            pending_empty = 0
+            for row in rows:
+                yield row
+        pending_empty += (window_end - row_number + 1) - len(rows)
+        row_number = window_end + 1
+        state["next_offset"] = row_number - header_row - 1
+    state["exhausted"] = row_number > last_row
+    if not state["exhausted"]:
+        for _ in range(pending_empty):
+            yield []
+
+
+def stream_rows(rows, state, spreadsheet_id, sheet_name, full_range, offset):
+    """
+    Stream the same {"data": ..., "metadata": ...} document the regular read
+    returns, with rows serialized one at a time and a continuation cursor at
+    the end when the range has more rows than `limit`.
+    """
+    yield '{"data": {"rows": ['
+    row_count = 0
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(row)
+        separator = ','
+        row_count += 1
+    summary = {
+        "row_count": row_count,
+        "spreadsheet_id": spreadsheet_id,
+        "sheet_name": sheet_name,
+        "range": full_range,
+        "offset": offset,
+        "next_cursor": None if state["exhausted"] else encode_cursor(full_range, state["next_offset"])
+    }
+    yield '], ' + json.dumps(summary)[1:-1] + '}, "metadata": '
+    yield json.dumps(dict(summary, status="success")) + '}'
+
 
 @router.route("/execute", methods=["GET", "POST"])
 def execute():
@@ -40,9 +239,21 @@ def execute():
         sheet_name = form_data.get("sheet_name")
         range_str = form_data.get("range", "")
         include_headers = form_data.get("include_headers", True)
+        stream = form_data.get("stream", False)
 
+        if form_data.get("targets") or form_data.get("spreadsheet_ids"):
+            return execute_fan_out(form_data, include_headers, stream)
         if not spreadsheet_id:
             return Response(data={"error": "Spreadsheet ID is required"}, metadata={"status": "error"})
+        circuit = circuit_breaker.check(spreadsheet_id)
+        if circuit:
+            logger.error(f"Circuit open for spreadsheet {spreadsheet_id}: {circuit['reason']}")
+            return Response(
+                data={"error": circuit["message"], "circuit": circuit},
+                metadata={"status": "error", "circuit_state": circuit["state"]}
+            )
+        if form_data.get("ranges"):
+            return execute_batch_get(form_data, spreadsheet_id, include_headers)
         if not sheet_name:
             return Response(data={"error": "Sheet name is required"}, metadata={"status": "error"})
 
@@ -51,15 +262,139 @@ def execute():
         else:
             full_range = sheet_name
 
-        service = get_google_sheets_service(readonly=True)
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=full_range
-        ).execute()
-        values = result.get('values', [])
+        try:
+            columns = parse_columns(form_data.get("columns"))
+            filters = parse_filters(form_data.get("filters"))
+        except ValueError as e:
+            return Response(data={"error": str(e)}, metadata={"status": "error"})
+        selecting = bool(columns or filters)
+        output_format = (form_data.get("output_format") or "rows").lower()
+        value_render_option = (form_data.get("value_render_option") or DEFAULT_VALUE_RENDER_OPTION).upper()
+        if output_format not in OUTPUT_FORMATS:
+            return Response(data={"error": f"Invalid output format. Must be one of: {', '.join(OUTPUT_FORMATS)}"}, metadata={"status": "error"})
+        if value_render_option not in VALUE_RENDER_OPTIONS:
+            return Response(data={"error": f"Invalid value render option. Must be one of: {', '.join(VALUE_RENDER_OPTIONS)}"}, metadata={"status": "error"})
 
-        if not include_headers and values:
-            values = values[1:]
+        if form_data.get("track_changes"):
+            return execute_changes(form_data, spreadsheet_id, sheet_name, range_str, full_range, value_render_option)
+
+        if stream:
+            try:
+                page_size = min(int(form_data.get("page_size") or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+                limit = int(form_data["limit"]) if form_data.get("limit") not in (None, "") else None
+                cursor = form_data.get("cursor")
+                offset = decode_cursor(cursor, full_range) if cursor else int(form_data.get("offset") or 0)
+                if page_size < 1 or offset < 0 or (limit is not None and limit < 0):
+                    raise ValueError("page_size must be positive; offset and limit must not be negative")
+                if range_str and range_str.strip():
+                    parse_a1_range(range_str)
+                if output_format not in STREAMABLE_FORMATS:
+                    raise ValueError(f"Streaming supports output formats: {', '.join(STREAMABLE_FORMATS)}")
+            except (TypeError, ValueError) as e:
+                return Response(data={"error": str(e)}, metadata={"status": "error"})
+            service = get_google_sheets_service(readonly=True)
+            state = {"next_offset": offset, "exhausted": True}
+            emit_header = bool(include_headers) and not offset
+            rows = read_row_windows(
+                service, spreadsheet_id, sheet_name, range_str.strip() if range_str else "",
+                offset, limit, page_size, emit_header or selecting, state, value_render_option
+            )
+            # Pull the header now so bad sheets/columns fail before streaming starts
+            header = next(rows) if emit_header or selecting else None
+            if selecting:
+                try:
+                    selector = RowSelector(header, columns, filters)
+                except ValueError as e:
+                    return Response(data={"error": str(e)}, metadata={"status": "error"})
+                rows = selector.select(rows)
+                header = selector.headers
+            if emit_header:
+                rows = itertools.chain([header], rows)
+            elif not selecting:
+                # Nothing has been read yet without a header: read up to the
+                # first row so a bad sheet or range fails before the 200
+                try:
+                    rows = itertools.chain([next(rows)], rows)
+                except StopIteration:
+                    rows = iter(())
+            if output_format == "csv":
+                # CSV has nowhere to put a trailing cursor; page with offset/limit
+                return FlaskResponse(stream_with_context(iter_csv(rows)), mimetype=CSV_MIMETYPE)
+            return FlaskResponse(
+                stream_with_context(stream_rows(rows, state, spreadsheet_id, sheet_name, full_range, offset)),
+                mimetype="application/json"
+            )
+
+        try:
+            cache_ttl = float(form_data["cache_ttl"]) if form_data.get("cache_ttl") not in (None, "") else None
+        except (TypeError, ValueError):
+            return Response(data={"error": "cache_ttl must be a number of seconds"}, metadata={"status": "error"})
+
+        # Filtering and columnar output need the header row, so fetch (and cache) the range with it
+        needs_header = selecting or output_format in ("columnar", "arrow")
+        keep_header = bool(include_headers) or needs_header
+
+        def fetch_values():
+            service = get_google_sheets_service(readonly=True)
+            result = service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id,
+                range=full_range,
+                valueRenderOption=value_render_option
+            ).execute()
+            values = result.get('values', [])
+            if not keep_header and values:
+                # Drop the header in place rather than copying the whole list
+                del values[0]
+            return values
+
+        values, cache_status = read_cache.get_or_fetch(
+            (spreadsheet_id, full_range, keep_header, value_render_option), fetch_values, ttl=cache_ttl
+        )
+
+        if needs_header:
+            header = values[0] if values else []
+            data_rows = itertools.islice(values, 1, None)
+            if selecting:
+                try:
+                    selector = RowSelector(header, columns, filters)
+                except ValueError as e:
+                    return Response(data={"error": str(e)}, metadata={"status": "error"})
+                header = selector.headers
+                data_rows = selector.select(data_rows)
+            if output_format == "arrow":
+                try:
+                    return FlaskResponse(to_arrow_ipc(header, data_rows), mimetype=ARROW_MIMETYPE)
+                except ValueError as e:
+                    return Response(data={"error": str(e)}, metadata={"status": "error"})
+            if output_format == "columnar":
+                column_values = to_columnar(header, data_rows)
+                row_count = len(next(iter(column_values.values()), []))
+                return Response(
+                    data={
+                        "columns": column_values,
+                        "row_count": row_count,
+                        "spreadsheet_id": spreadsheet_id,
+                        "sheet_name": sheet_name,
+                        "range": full_range
+                    },
+                    metadata={
+                        "status": "success",
+                        "spreadsheet_id": spreadsheet_id,
+                        "sheet_name": sheet_name,
+                        "range": full_range,
+                        "row_count": row_count,
+                        "output_format": output_format,
+                        "cache_status": cache_status,
+                        "read_cache": read_cache.get_stats()
+                    }
+                )
+            # The cached list is shared, so select into a new one
+            values = list(data_rows)
+            if include_headers:
+                values.insert(0, header)
+
+        if output_format == "csv":
+            return FlaskResponse(iter_csv(values), mimetype=CSV_MIMETYPE)
 
         return Response(
             data={
@@ -74,7 +409,9 @@ def execute():
                 "spreadsheet_id": spreadsheet_id,
                 "sheet_name": sheet_name,
                 "range": full_range,
-                "row_count": len(values)
+                "row_count": len(values),
+                "cache_status": cache_status,
+                "read_cache": read_cache.get_stats()
             }
         )
     except Exception as e:
@@ -86,6 +423,174 @@ def execute():
         )
 
 
+def execute_changes(form_data, spreadsheet_id, sheet_name, range_str, full_range, value_render_option):
+    """
+    Delta read: return rows inserted, modified or deleted since the snapshot
+    identified by `changes_since`, plus a cursor for the next call
+    """
+    key_column = form_data.get("key_column")
+    previous_cursor = form_data.get("changes_since")
+    range_str = range_str.strip() if range_str else ""
+    try:
+        if range_str:
+            parse_a1_range(range_str)
+        service = get_google_sheets_service(readonly=True)
+        state = {"next_offset": 0, "exhausted": True}
+        rows = read_row_windows(
+            service, spreadsheet_id, sheet_name, range_str, 0, None, MAX_PAGE_SIZE, True, state, value_render_option
+        )
+        header = next(rows)
+        key_index = None
+        if key_column:
+            if key_column not in header:
+                raise ValueError(f"Key column '{key_column}' not found in sheet headers: {header}")
+            key_index = header.index(key_column)
+        _, start_row, _, _ = parse_a1_range(range_str) if range_str else (None, None, None, None)
+        scope = f"{spreadsheet_id}|{full_range}|{key_column or ''}|{value_render_option}"
+        changes, cursor = compute_changes(
+            scope, previous_cursor, enumerate(rows, start=(start_row or 1) + 1), key_index
+        )
+    except ValueError as e:
+        return Response(data={"error": str(e)}, metadata={"status": "error"})
+    counts = {name: len(items) for name, items in changes.items()}
+    return Response(
+        data=dict(
+            changes,
+            header=header,
+            cursor=cursor,
+            spreadsheet_id=spreadsheet_id,
+            sheet_name=sheet_name,
+            range=full_range
+        ),
+        metadata={
+            "status": "success",
+            "spreadsheet_id": spreadsheet_id,
+            "sheet_name": sheet_name,
+            "range": full_range,
+            "cursor": cursor,
+            "change_counts": counts
+        }
+    )
+
+
+def execute_batch_get(form_data, spreadsheet_id, include_headers):
+    try:
+        full_ranges = parse_ranges(form_data.get("ranges"))
+        value_render_option = (form_data.get("value_render_option") or DEFAULT_VALUE_RENDER_OPTION).upper()
+        if value_render_option not in VALUE_RENDER_OPTIONS:
+            raise ValueError(f"Invalid value render option. Must be one of: {', '.join(VALUE_RENDER_OPTIONS)}")
+        cache_ttl = float(form_data["cache_ttl"]) if form_data.get("cache_ttl") not in (None, "") else None
+    except (TypeError, ValueError) as e:
+        return Response(data={"error": str(e)}, metadata={"status": "error"})
+
+    def fetch_results():
+        service = get_google_sheets_service(readonly=True)
+        return batch_get_values(service, spreadsheet_id, full_ranges, include_headers, value_render_option)
+
+    results, cache_status = read_cache.get_or_fetch(
+        (spreadsheet_id, ("batchGet",) + tuple(full_ranges), bool(include_headers), value_render_option),
+        fetch_results, ttl=cache_ttl
+    )
+    row_counts = {full_range: len(rows) for full_range, rows in results.items()}
+    return Response(
+        data={
+            "results": results,
+            "row_counts": row_counts,
+            "spreadsheet_id": spreadsheet_id,
+            "ranges": full_ranges
+        },
+        metadata={
+            "status": "success",
+            "spreadsheet_id": spreadsheet_id,
+            "ranges": full_ranges,
+            "row_count": sum(row_counts.values()),
+            "cache_status": cache_status,
+            "read_cache": read_cache.get_stats()
+        }
+    )
+
+
+def execute_fan_out(form_data, include_headers, stream):
+    """
+    Read one range from many spreadsheets concurrently. Streams NDJSON, one
+    line per target in completion order and a closing summary line, or
+    returns every result at once when not streaming.
+    """
+    try:
+        targets = parse_fan_out_targets(form_data)
+        value_render_option = (form_data.get("value_render_option") or DEFAULT_VALUE_RENDER_OPTION).upper()
+        if value_render_option not in VALUE_RENDER_OPTIONS:
+            raise ValueError(f"Invalid value render option. Must be one of: {', '.join(VALUE_RENDER_OPTIONS)}")
+        target_timeout = float(form_data.get("target_timeout") or FANOUT_TARGET_TIMEOUT_SECONDS)
+        if target_timeout <= 0:
+            raise ValueError("target_timeout must be positive")
+    except (TypeError, ValueError) as e:
+        return Response(data={"error": str(e)}, metadata={"status": "error"})
+
+    def target_values(result):
+        values = result.get('values', [])
+        if not include_headers and values:
+            del values[0]
+        return {"values": values, "row_count": len(values)}
+
+    def fetch_target(target):
+        circuit = circuit_breaker.check(target["spreadsheet_id"])
+        if circuit:
+            return {"status": "error", "error": circuit["message"], "error_class": "circuit_open"}
+        with sheets_service(readonly=True) as service:
+            result = service.spreadsheets().values().get(
+                spreadsheetId=target["spreadsheet_id"],
+                range=target["range"],
+                valueRenderOption=value_render_option,
+                fields='values'
+            ).execute()
+        return target_values(result)
+
+    async def fetch_target_async(target):
+        # iter_fan_out_async has already checked the circuit
+        result = await get_async_client(readonly=True).values_get(
+            target["spreadsheet_id"],
+            target["range"],
+            valueRenderOption=value_render_option,
+            fields='values'
+        )
+        return target_values(result)
+
+    if ASYNC_CLIENT_ENABLED:
+        # All targets in flight at once on the shared event loop
+        results = iter_fan_out_async(targets, fetch_target_async, target_timeout)
+    else:
+        results = iter_fan_out(targets, fetch_target, target_timeout)
+    if stream:
+        def generate():
+            failed = 0
+            for result in results:
+                failed += result["status"] != "success"
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"summary": {"targets": len(targets), "succeeded": len(targets) - failed, "failed": failed}}) + "\n"
+        return FlaskResponse(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+    collected = sorted(results, key=lambda result: result["index"])
+    failed = [result for result in collected if result["status"] != "success"]
+    if not failed:
+        status = "success"
+    else:
+        status = "partial" if len(failed) < len(collected) else "error"
+    return Response(
+        data={
+            "results": collected,
+            "failed": [{"index": r["index"], "spreadsheet_id": r["spreadsheet_id"], "error": r["error"]} for r in failed]
+        },
+        metadata={
+            "status": status,
+            "targets": len(targets),
+            "succeeded": len(collected) - len(failed),
+            "failed": len(failed),
+            "row_count": sum(result.get("row_count", 0) for result in collected)
+        }
+    )
+
+
 @router.route("/content", methods=["GET", "POST"])
 def content():
     """
@@ -195,16 +700,12 @@ def content():
                 if spreadsheet_id:
                     logger.info(f"Getting sheets for spreadsheet: {spreadsheet_id}")
                     try:
-                        # Use Google Sheets API to get sheet metadata
-                        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-                        sheets = spreadsheet.get('sheets', [])
-                        
+                        # Use the shared metadata cache to get sheet titles
                         sheet_data = []
-                        for sheet in sheets:
-                            sheet_properties = sheet.get('properties', {})
+                        for title in metadata_cache.get_sheet_titles(service, spreadsheet_id):
                             sheet_data.append({
-                                "value": sheet_properties.get('title', ''),
-                                "label": sheet_properties.get('title', '')
+                                "value": title,
+                                "label": title
                             })
                         
                         logger.info(f"Found {len(sheet_data)} sheets")
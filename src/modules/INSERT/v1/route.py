@@ -17,7 +17,12 @@ import json
 import logging
 import traceback
 import re
+import itertools
 from src.utils.google_sheets import get_google_sheets_service
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.retry import classify_exception, may_have_been_applied
+from src.utils.write_hooks import notify_spreadsheet_written
+from src.utils.write_coalescer import append_coalescer, COALESCE_ENABLED
 
 # Set up logging
 logging.basicConfig(level=logging.ERROR)  # Only log errors by default
@@ -31,6 +36,146 @@ SERVICE_ACCOUNT_FILE = "/usr/src/app/quail-asset-7c70b02f0362.json"
 # Create router instance
 router = Router()
 
+# Keep each append body well under the API's request size limit
+MAX_CHUNK_BYTES = int(os.environ.get("SHEETS_INSERT_CHUNK_BYTES", str(2 * 1024 * 1024)))
+MAX_CHUNK_ROWS = int(os.environ.get("SHEETS_INSERT_CHUNK_ROWS", "10000"))
+# Larger inserts are not echoed back in the response
+MAX_ECHOED_OBJECTS = 1000
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_objects(data_raw):
+    """
+    Yield the elements of a JSON array one at a time. Lists are passed
+    through as-is.
+    """
+    if isinstance(data_raw, list):
+        yield from data_raw
+        return
+    if not isinstance(data_raw, str):
+        raise ValueError("data_to_insert must be a list/array")
+    decoder = json.JSONDecoder()
+    index = _JSON_WHITESPACE.match(data_raw, 0).end()
+    if data_raw[index:index + 1] != '[':
+        raise ValueError("data_to_insert must be a list/array")
+    index = _JSON_WHITESPACE.match(data_raw, index + 1).end()
+    if data_raw[index:index + 1] == ']':
+        return
+    while True:
+        obj, index = decoder.raw_decode(data_raw, index)
+        yield obj
+        index = _JSON_WHITESPACE.match(data_raw, index).end()
+        delimiter = data_raw[index:index + 1]
+        if delimiter == ',':
+            index = _JSON_WHITESPACE.match(data_raw, index + 1).end()
+            continue
+        if delimiter == ']' and not data_raw[index + 1:].strip():
+            return
+        raise json.JSONDecodeError("Expecting ',' delimiter or end of array", data_raw, index)
+
+
+def parse_json_objects(data_raw):
+    """
+    Decode and check every element before anything is appended, so a
+    malformed payload is rejected with nothing written
+    """
+    data_objects = []
+    for obj in iter_json_objects(data_raw):
+        if not isinstance(obj, dict):
+            raise ValueError("Each element in data_to_insert must be an object")
+        data_objects.append(obj)
+    return data_objects
+
+
+def failed_append_response(api_error, rows_inserted, resume_offset, extra=None):
+    """
+    Error response for a failed append. When the append may still have been
+    applied, resuming from resume_offset could duplicate its rows, so the
+    response says so.
+    """
+    error_class = classify_exception(api_error)
+    ambiguous = may_have_been_applied(error_class)
+    error = f"Failed to insert data into Google Sheet: {str(api_error)}"
+    if ambiguous:
+        error += (
+            f". The last append may have been applied; check the sheet for rows from offset {resume_offset}"
+            " before resuming, or they may be inserted twice"
+        )
+    data = {
+        "error": error,
+        "error_class": error_class,
+        "ambiguous": ambiguous,
+        "rows_inserted": rows_inserted,
+        "resume_offset": resume_offset
+    }
+    data.update(extra or {})
+    return Response(
+        data=data,
+        metadata={"status": "error", "error_class": error_class, "ambiguous": ambiguous, "resume_offset": resume_offset}
+    )
+
+
+def iter_row_chunks(data_objects, headers, header_row, echoed, max_bytes=MAX_CHUNK_BYTES, max_rows=MAX_CHUNK_ROWS):
+    """
+    Convert objects to rows lazily and group them into size-bounded chunks.
+    Yields (values, object_count); the optional header row rides in the first chunk.
+    """
+    values = [header_row] if header_row else []
+    chunk_bytes = len(json.dumps(header_row)) if header_row else 0
+    object_count = 0
+    for obj in data_objects:
+        if not isinstance(obj, dict):
+            raise ValueError("Each element in data_to_insert must be an object")
+        row = [obj.get(h, "") for h in headers]
+        row_bytes = len(json.dumps(row))
+        if object_count and (chunk_bytes + row_bytes > max_bytes or object_count >= max_rows):
+            yield values, object_count
+            values = []
+            chunk_bytes = 0
+            object_count = 0
+        values.append(row)
+        chunk_bytes += row_bytes
+        object_count += 1
+        if echoed is not None and len(echoed) < MAX_ECHOED_OBJECTS:
+            echoed.append(obj)
+    if object_count:
+        yield values, object_count
+
+
+def merge_updated_ranges(first_range, last_range):
+    # "S!A2:C100" + "S!A201:C300" -> "S!A2:C300"
+    if not first_range or not last_range or first_range == last_range:
+        return first_range or last_range
+    return f"{first_range.split(':')[0]}:{last_range.split(':')[-1]}"
+
+
+def coalesced_insert(spreadsheet_id, sheet_name, headers, data_objects, start_offset, append_values):
+    rows = [[obj.get(h, "") for h in headers] for obj in data_objects]
+    key = (spreadsheet_id, sheet_name, tuple(headers))
+    try:
+        updated_range, batch_info = append_coalescer.append(key, rows, append_values)
+    except Exception as api_error:
+        logger.error(f"API error while inserting data: {api_error}")
+        notify_spreadsheet_written(spreadsheet_id)
+        return failed_append_response(api_error, 0, start_offset)
+    notify_spreadsheet_written(spreadsheet_id)
+    return Response(
+        data={
+            "message": f"Successfully appended {len(rows)} rows",
+            "updated_range": updated_range,
+            "inserted_data": data_objects
+        },
+        metadata={
+            "status": "success",
+            "spreadsheet_id": spreadsheet_id,
+            "sheet_name": sheet_name,
+            "rows_inserted": len(rows),
+            "coalesced": batch_info,
+            "coalescer": append_coalescer.get_stats()
+        }
+    )
+
 
 @router.route("/execute", methods=["GET", "POST"])
 def execute():
@@ -42,6 +187,7 @@ def execute():
         sheet_name = form_data.get("sheet_name")
         data_to_insert_raw = form_data.get("data_to_insert", "[]")
         include_headers = form_data.get("include_headers", False)
+        coalesce = form_data.get("coalesce", COALESCE_ENABLED)
 
         # Validation
         if not spreadsheet_id:
@@ -55,16 +201,20 @@ def execute():
                 metadata={"status": "error"}
             )
 
-        # Parse JSON input
         try:
-            if isinstance(data_to_insert_raw, str):
-                data_objects = json.loads(data_to_insert_raw)
-            else:
-                data_objects = data_to_insert_raw
-            if not isinstance(data_objects, list):
-                raise ValueError("data_to_insert must be a list/array")
-            if not all(isinstance(row, dict) for row in data_objects):
-                raise ValueError("Each element in data_to_insert must be an object")
+            start_offset = int(form_data.get("start_offset") or 0)
+            if start_offset < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response(
+                data={"error": "start_offset must be a non-negative integer"},
+                metadata={"status": "error"}
+            )
+
+        # Validate the whole payload before the first append; rows are built
+        # from the decoded objects chunk by chunk
+        try:
+            data_objects = parse_json_objects(data_to_insert_raw)
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON in data_to_insert: {e}")
             return Response(
@@ -90,6 +240,14 @@ def execute():
                 metadata={"status": "error"}
             )
 
+        circuit = circuit_breaker.check(spreadsheet_id)
+        if circuit:
+            logger.error(f"Circuit open for spreadsheet {spreadsheet_id}: {circuit['reason']}")
+            return Response(
+                data={"error": circuit["message"], "circuit": circuit},
+                metadata={"status": "error", "circuit_state": circuit["state"]}
+            )
+
         # Create Google Sheets service
         try:
             service = get_google_sheets_service()
@@ -100,40 +258,74 @@ def execute():
                 metadata={"status": "error"}
             )
 
-        # Extract headers and convert data to rows
+        # Headers come from the first object; rows are built lazily per chunk
         headers = list(data_objects[0].keys())
-        rows = [[row.get(h, "") for h in headers] for row in data_objects]
-        final_data = [headers] + rows if include_headers else rows
+        data_objects = itertools.islice(data_objects, start_offset, None)
+        header_row = headers if include_headers and start_offset == 0 else None
 
-        # Insert data using the Google Sheets API
-        try:
-            range_param = f"{sheet_name}!A1"
-            body = {"values": final_data}
-            result = service.spreadsheets().values().append(
+        range_param = f"{sheet_name}!A1"
+
+        def append_values(values):
+            return service.spreadsheets().values().append(
                 spreadsheetId=spreadsheet_id,
                 range=range_param,
                 valueInputOption='RAW',
                 insertDataOption='INSERT_ROWS',
-                body=body
+                body={"values": values}
             ).execute()
+
+        # Small header-less inserts may share one append with concurrent
+        # inserts to the same sheet and columns
+        if coalesce and header_row is None:
+            head = list(itertools.islice(data_objects, append_coalescer.max_rows + 1))
+            if 0 < len(head) <= append_coalescer.max_rows:
+                return coalesced_insert(spreadsheet_id, sheet_name, headers, head, start_offset, append_values)
+            data_objects = itertools.chain(head, data_objects)
+
+        # Insert data using the Google Sheets API, one append per chunk in order
+        chunks = []
+        inserted_data = []
+        next_offset = start_offset
+        try:
+            for values, object_count in iter_row_chunks(data_objects, headers, header_row, inserted_data):
+                result = append_values(values)
+                chunks.append({
+                    "chunk": len(chunks) + 1,
+                    "start_offset": next_offset,
+                    "rows": object_count,
+                    "updated_range": result.get("updates", {}).get("updatedRange", "")
+                })
+                next_offset += object_count
+                logger.info(f"Appended chunk {len(chunks)}: {object_count} rows, next offset {next_offset}")
         except Exception as api_error:
             logger.error(f"API error while inserting data: {api_error}")
+            # A failed append may still have been applied
+            notify_spreadsheet_written(spreadsheet_id)
+            return failed_append_response(api_error, next_offset - start_offset, next_offset, {"chunks": chunks})
+        notify_spreadsheet_written(spreadsheet_id)
+
+        rows_inserted = next_offset - start_offset
+        if not chunks:
             return Response(
-                data={"error": f"Failed to insert data into Google Sheet: {str(api_error)}"},
+                data={"error": f"start_offset {start_offset} is past the end of data_to_insert"},
                 metadata={"status": "error"}
             )
+        response_data = {
+            "message": f"Successfully appended {rows_inserted} rows",
+            "updated_range": merge_updated_ranges(chunks[0]["updated_range"], chunks[-1]["updated_range"]),
+            "chunks": chunks
+        }
+        if len(inserted_data) == rows_inserted:
+            response_data["inserted_data"] = inserted_data
 
         return Response(
-            data={
-                "message": f"Successfully appended {len(rows)} rows",
-                "updated_range": result.get("updates", {}).get("updatedRange", ""),
-                "inserted_data": data_objects
-            },
+            data=response_data,
             metadata={
                 "status": "success",
                 "spreadsheet_id": spreadsheet_id,
                 "sheet_name": sheet_name,
-                "rows_inserted": len(rows)
+                "rows_inserted": rows_inserted,
+                "chunk_count": len(chunks)
             }
         )
 
@@ -165,7 +357,9 @@ def content():
                 "data_to_insert": "JSON array of objects to insert"
             },
             "optional_fields": {
-                "include_headers": "Boolean - whether to include headers (defaults to false)"
+                "include_headers": "Boolean - whether to include headers (defaults to false)",
+                "start_offset": "Integer - skip this many objects, e.g. resume_offset from a failed insert (check the sheet first if that insert was marked ambiguous)",
+                "coalesce": "Boolean - share one append with concurrent inserts to the same sheet and columns"
             },
             "data_format_example": [
                 {"Name": "John Doe", "Email": "john@example.com", "Phone": "123-456-7890"},
@@ -0,0 +1 @@
+# This file makes the JOBS v1 directory a Python package
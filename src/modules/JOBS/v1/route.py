@@ -0,0 +1,75 @@
+# Set environment variables BEFORE any imports to prevent PyO3 conflicts
+import os
+os.environ['CRYPTOGRAPHY_DONT_BUILD_RUST'] = '1'
+os.environ['CRYPTOGRAPHY_USE_PURE_PYTHON'] = '1'
+
+from workflows_cdk import Response, Request, Router
+from flask import request as flask_request
+import logging
+import traceback
+
+from src.utils.write_jobs import get_job, list_jobs, FINISHED_STATES, SUCCEEDED
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Create router instance
+router = Router()
+
+
+@router.route("/execute", methods=["GET", "POST"])
+def execute():
+    """
+    Report the state of a background write job
+    """
+    try:
+        request = Request(flask_request)
+        data = request.data
+        form_data = data.get("form_data", data)
+        job_id = form_data.get("job_id")
+        if not job_id:
+            return Response(data={"error": "Job ID is required"}, metadata={"status": "error"})
+        job = get_job(job_id)
+        if job is None:
+            return Response(data={"error": f"Job {job_id} not found"}, metadata={"status": "error"})
+        return Response(
+            data=job,
+            metadata={
+                "status": "error" if job["status"] in FINISHED_STATES and job["status"] != SUCCEEDED else "success",
+                "job_status": job["status"],
+                "finished": job["status"] in FINISHED_STATES
+            }
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in execute function: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return Response(
+            data={"error": f"Unexpected error: {str(e)}"},
+            metadata={"status": "error"}
+        )
+
+
+@router.route("/content", methods=["GET", "POST"])
+def content():
+    """
+    List recent jobs
+    """
+    try:
+        jobs = list_jobs()
+        return Response(
+            data={
+                "jobs": [
+                    {"job_id": job["job_id"], "kind": job["kind"], "status": job["status"], "created_at": job["created_at"]}
+                    for job in jobs
+                ]
+            },
+            metadata={"status": "success"}
+        )
+    except Exception as e:
+        logger.error(f"Error in content function: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return Response(
+            data={"error": f"Error in content function: {str(e)}"},
+            metadata={"status": "error"}
+        )
@@ -0,0 +1 @@
+# This file makes the QUERY v1 directory a Python package
@@ -0,0 +1,164 @@
+# Set environment variables BEFORE any imports to prevent PyO3 conflicts
+import os
+os.environ['CRYPTOGRAPHY_DONT_BUILD_RUST'] = '1'
+os.environ['CRYPTOGRAPHY_USE_PURE_PYTHON'] = '1'
+
+from workflows_cdk import Response, Request, Router
+from flask import request as flask_request
+import json
+import time
+import logging
+import traceback
+
+from src.utils.row_filters import parse_columns
+from src.utils.sheet_replica import (
+    register_replica, get_replica, refresh_replica, query_replica, ensure_scheduler, ensure_scheduler_if_registered
+)
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Create router instance
+router = Router()
+
+# Replicas registered before this worker started keep refreshing in the background
+ensure_scheduler_if_registered()
+
+
+def parse_params(params_raw):
+    if params_raw in (None, "", []):
+        return []
+    if isinstance(params_raw, str):
+        try:
+            params_raw = json.loads(params_raw)
+        except json.JSONDecodeError:
+            raise ValueError("params must be a JSON array")
+    if not isinstance(params_raw, list):
+        raise ValueError("params must be an array")
+    return params_raw
+
+
+def parse_seconds(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number of seconds")
+    if seconds <= 0:
+        raise ValueError(f"{name} must be positive")
+    return seconds
+
+
+def replica_settings_changed(replica, index_columns, refresh_interval):
+    """
+    Whether a query asks for replica settings other than the stored ones;
+    settings the query leaves out never count as a change
+    """
+    if index_columns and sorted(index_columns) != json.loads(replica["index_columns"]):
+        return True
+    return refresh_interval is not None and refresh_interval != replica["refresh_interval"]
+
+
+def ensure_fresh_replica(spreadsheet_id, sheet_name, max_staleness):
+    """
+    Refresh synchronously when the replica has never been loaded, is marked
+    stale by a write, or is older than max_staleness
+    """
+    replica = get_replica(spreadsheet_id, sheet_name)
+    never_loaded = replica["refreshed_at"] is None
+    too_old = max_staleness is not None and not never_loaded and time.time() - replica["refreshed_at"] > max_staleness
+    if never_loaded or replica["stale"] or too_old:
+        refreshed = refresh_replica(spreadsheet_id, sheet_name)
+        if not refreshed and never_loaded:
+            raise RuntimeError("Replica is being built by another worker, retry shortly")
+        replica = get_replica(spreadsheet_id, sheet_name)
+    return replica
+
+
+@router.route("/execute", methods=["GET", "POST"])
+def execute():
+    """
+    Answer a SQL SELECT from the local replica of a sheet
+    """
+    logger.info("=== QUERY REPLICA EXECUTE START ===")
+    try:
+        request = Request(flask_request)
+        data = request.data
+        form_data = data.get("form_data", data)
+        spreadsheet_id = form_data.get("spreadsheet_id")
+        sheet_name = form_data.get("sheet_name")
+        sql = form_data.get("sql", "")
+        if not spreadsheet_id:
+            return Response(data={"error": "Spreadsheet ID is required"}, metadata={"status": "error"})
+        if not sheet_name:
+            return Response(data={"error": "Sheet name is required"}, metadata={"status": "error"})
+        if not sql or not sql.strip():
+            return Response(data={"error": "SQL query is required"}, metadata={"status": "error"})
+        try:
+            params = parse_params(form_data.get("params"))
+            index_columns = parse_columns(form_data.get("index_columns"))
+            refresh_interval = parse_seconds(form_data.get("refresh_interval"), "refresh_interval")
+            max_staleness = parse_seconds(form_data.get("max_staleness"), "max_staleness")
+        except ValueError as e:
+            return Response(data={"error": str(e)}, metadata={"status": "error"})
+        try:
+            replica = get_replica(spreadsheet_id, sheet_name)
+            if replica is None or replica_settings_changed(replica, index_columns, refresh_interval):
+                register_replica(spreadsheet_id, sheet_name, index_columns, refresh_interval)
+            else:
+                ensure_scheduler()
+            replica = ensure_fresh_replica(spreadsheet_id, sheet_name, max_staleness)
+        except Exception as replica_error:
+            logger.error(f"Failed to refresh replica: {replica_error}")
+            return Response(
+                data={"error": f"Failed to refresh replica: {str(replica_error)}"},
+                metadata={"status": "error"}
+            )
+        started = time.perf_counter()
+        try:
+            columns, rows, truncated = query_replica(replica, sql, params)
+        except ValueError as e:
+            return Response(data={"error": str(e)}, metadata={"status": "error"})
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        return Response(
+            data={
+                "columns": columns,
+                "rows": rows,
+                "row_count": len(rows),
+                "truncated": truncated,
+                "spreadsheet_id": spreadsheet_id,
+                "sheet_name": sheet_name
+            },
+            metadata={
+                "status": "success",
+                "spreadsheet_id": spreadsheet_id,
+                "sheet_name": sheet_name,
+                "row_count": len(rows),
+                "query_ms": elapsed_ms,
+                "replica_refreshed_at": replica["refreshed_at"],
+                "replica_row_count": replica["row_count"]
+            }
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in execute function: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return Response(
+            data={"error": f"Unexpected error: {str(e)}"},
+            metadata={"status": "error"}
+        )
+
+
+@router.route("/content", methods=["GET", "POST"])
+def content():
+    """
+    Return content for the module (not used for QUERY module)
+    """
+    return Response(
+        data={
+            "message": "QUERY module content endpoint",
+            "description": "This endpoint is not used for the QUERY module"
+        },
+        metadata={"status": "success"}
+    )
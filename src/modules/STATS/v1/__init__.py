@@ -0,0 +1 @@
+# This file makes the STATS v1 directory a Python package
@@ -0,0 +1,91 @@
+# Set environment variables BEFORE any imports to prevent PyO3 conflicts
+import os
+os.environ['CRYPTOGRAPHY_DONT_BUILD_RUST'] = '1'
+os.environ['CRYPTOGRAPHY_USE_PURE_PYTHON'] = '1'
+
+from workflows_cdk import Response, Request, Router
+from flask import request as flask_request
+import logging
+import traceback
+
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.google_sheets import get_service_cache_stats
+from src.utils.key_index_cache import key_index_cache
+from src.utils.quota_scheduler import get_quota_stats
+from src.utils.read_cache import read_cache
+from src.utils.retry import get_retry_stats
+from src.utils.sheet_metadata import metadata_cache
+from src.utils.token_manager import get_token_manager_stats
+from src.utils.write_coalescer import append_coalescer
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Create router instance
+router = Router()
+
+STATS_SECTIONS = {
+    "clients": get_service_cache_stats,
+    "tokens": get_token_manager_stats,
+    "quota": get_quota_stats,
+    "retries": get_retry_stats,
+    "circuit_breaker": circuit_breaker.get_stats,
+    "read_cache": read_cache.get_stats,
+    "metadata_cache": metadata_cache.get_stats,
+    "key_index_cache": key_index_cache.get_stats,
+    "insert_coalescer": append_coalescer.get_stats
+}
+
+
+def parse_sections(sections_raw):
+    if not sections_raw:
+        return list(STATS_SECTIONS)
+    if isinstance(sections_raw, str):
+        sections_raw = sections_raw.split(',')
+    sections = [str(section).strip() for section in sections_raw if str(section).strip()]
+    unknown = [section for section in sections if section not in STATS_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown stats sections: {unknown}. Must be among: {', '.join(STATS_SECTIONS)}")
+    return sections
+
+
+@router.route("/execute", methods=["GET", "POST"])
+def execute():
+    """
+    Report this worker's counters. Each gunicorn worker keeps its own, so
+    successive calls may be answered by different workers (see worker_pid).
+    """
+    try:
+        request = Request(flask_request)
+        data = request.data
+        form_data = data.get("form_data", data)
+        try:
+            sections = parse_sections(form_data.get("sections"))
+        except ValueError as e:
+            return Response(data={"error": str(e)}, metadata={"status": "error"})
+        return Response(
+            data={section: STATS_SECTIONS[section]() for section in sections},
+            metadata={"status": "success", "worker_pid": os.getpid()}
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in execute function: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return Response(
+            data={"error": f"Unexpected error: {str(e)}"},
+            metadata={"status": "error"}
+        )
+
+
+@router.route("/content", methods=["GET", "POST"])
+def content():
+    """
+    Return content for the module (not used for STATS module)
+    """
+    return Response(
+        data={
+            "message": "STATS module content endpoint",
+            "description": "This endpoint is not used for the STATS module"
+        },
+        metadata={"status": "success"}
+    )
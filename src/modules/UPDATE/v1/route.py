@@ -16,7 +16,13 @@ import json
 import logging
 import traceback
 import re
-from src.utils.google_sheets import get_google_sheets_service
+from src.utils.google_sheets import get_google_sheets_service, sheets_service
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.key_index_cache import key_index_cache
+from src.utils.sheet_metadata import metadata_cache
+from src.utils.write_hooks import notify_spreadsheet_written
+from src.utils.retry import classify_exception, describe_error, ERROR_DESCRIPTIONS
+from src.utils.write_jobs import register_job_runner, submit_job, job_accepted_response
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -70,19 +76,46 @@ def update_sheet_data(service, spreadsheet_id, sheet_name, range_param, update_d
         body = {
             "values": update_data
         }
+        # The update may overwrite key or header cells
+        key_index_cache.invalidate_spreadsheet(spreadsheet_id)
+        metadata_cache.invalidate_headers(spreadsheet_id)
         result = service.spreadsheets().values().update(
             spreadsheetId=spreadsheet_id,
             range=full_range,
             valueInputOption=value_input_option,
             body=body
         ).execute()
+        notify_spreadsheet_written(spreadsheet_id)
         return result
     except Exception as e:
+        notify_spreadsheet_written(spreadsheet_id)
         logger.error(f"Error updating sheet data: {e}")
         logger.error(f"Error type: {type(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+def run_update_job(payload, report_progress):
+    """
+    Background runner for async_mode updates
+    """
+    update_data = payload["update_data"]
+    report_progress({"stage": "updating", "rows": len(update_data)})
+    with sheets_service() as service:
+        result = update_sheet_data(
+            service, payload["spreadsheet_id"], payload["sheet_name"], payload["range"],
+            update_data, payload["value_input_option"]
+        )
+    return {
+        "message": f"Successfully updated data",
+        "updated_range": result.get("updatedRange", ""),
+        "updated_rows": len(update_data),
+        "updated_columns": len(update_data[0]) if update_data else 0,
+        "spreadsheet_id": payload["spreadsheet_id"],
+        "sheet_name": payload["sheet_name"]
+    }
+
+register_job_runner("UPDATE", run_update_job)
+
 @router.route("/execute", methods=["GET", "POST"])
 def execute():
     """
@@ -99,6 +132,7 @@ def execute():
         update_data_raw = form_data.get("update_data", "")
         value_input_option = form_data.get("value_input_option", "RAW")
         confirm_update = form_data.get("confirm_update", False)
+        async_mode = form_data.get("async_mode", False)
         if not spreadsheet_id:
             logger.error("Spreadsheet ID is missing")
             return Response(
@@ -138,21 +172,34 @@ def execute():
                 data={"error": f"Invalid value input option. Must be one of: {', '.join(valid_options)}"},
                 metadata={"status": "error"}
             )
+        circuit = circuit_breaker.check(spreadsheet_id)
+        if circuit:
+            logger.error(f"Circuit open for spreadsheet {spreadsheet_id}: {circuit['reason']}")
+            return Response(
+                data={"error": circuit["message"], "circuit": circuit},
+                metadata={"status": "error", "circuit_state": circuit["state"]}
+            )
+        if async_mode:
+            try:
+                job = submit_job("UPDATE", {
+                    "spreadsheet_id": spreadsheet_id,
+                    "sheet_name": sheet_name,
+                    "range": range_param,
+                    "update_data": update_data,
+                    "value_input_option": value_input_option
+                })
+            except Exception as job_error:
+                logger.error(f"Failed to queue update job: {job_error}")
+                return Response(
+                    data={"error": f"Failed to queue update job: {str(job_error)}"},
+                    metadata={"status": "error"}
+                )
+            return job_accepted_response(job)
         try:
             service = get_google_sheets_service()
         except Exception as service_error:
             logger.error(f"Failed to create Google Sheets service: {service_error}")
-            error_str = str(service_error).lower()
-            if "permission" in error_str or "unauthorized" in error_str or "403" in error_str:
-                logger.error("✗ ERROR TYPE: Permission/Authorization issue")
-            elif "quota" in error_str or "rate limit" in error_str or "429" in error_str:
-                logger.error("✗ ERROR TYPE: API quota/rate limit exceeded")
-            elif "network" in error_str or "connection" in error_str or "timeout" in error_str:
-                logger.error("✗ ERROR TYPE: Network connectivity issue")
-            elif "invalid" in error_str and "key" in error_str:
-                logger.error("✗ ERROR TYPE: Invalid service account credentials")
-            else:
-                logger.error("✗ ERROR TYPE: Unknown service creation error")
+            logger.error(f"✗ ERROR TYPE: {describe_error(service_error)}")
             return Response(
                 data={"error": f"Failed to create Google Sheets service: {str(service_error)}"},
                 metadata={"status": "error"}
@@ -161,22 +208,11 @@ def execute():
             result = update_sheet_data(service, spreadsheet_id, sheet_name, range_param, update_data, value_input_option)
         except Exception as update_error:
             logger.error(f"Error updating data: {update_error}")
-            error_str = str(update_error).lower()
-            if "permission" in error_str or "unauthorized" in error_str or "403" in error_str:
-                logger.error("✗ ERROR TYPE: Spreadsheet permission issue")
-            elif "not found" in error_str or "404" in error_str:
-                logger.error("✗ ERROR TYPE: Spreadsheet or sheet not found")
-            elif "quota" in error_str or "rate limit" in error_str or "429" in error_str:
-                logger.error("✗ ERROR TYPE: API quota/rate limit exceeded")
-            elif "network" in error_str or "connection" in error_str or "timeout" in error_str:
-                logger.error("✗ ERROR TYPE: Network connectivity issue")
-            elif "invalid" in error_str and "range" in error_str:
-                logger.error("✗ ERROR TYPE: Invalid range format")
-            else:
-                logger.error("✗ ERROR TYPE: Unknown update error")
+            error_class = classify_exception(update_error)
+            logger.error(f"✗ ERROR TYPE: {ERROR_DESCRIPTIONS[error_class]}")
             return Response(
-                data={"error": f"Failed to update data in Google Sheet: {str(update_error)}"},
-                metadata={"status": "error"}
+                data={"error": f"Failed to update data in Google Sheet: {str(update_error)}", "error_class": error_class},
+                metadata={"status": "error", "error_class": error_class}
             )
         logger.info("=== UPDATE SHEET DATA SUCCESS ===")
         return Response(
@@ -13,7 +13,14 @@ import json
 import logging
 import traceback
 
-from src.utils.google_sheets import get_google_sheets_service
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.google_sheets import get_google_sheets_service, sheets_service, column_letter, quote_sheet_name
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.key_index_cache import KeyIndex, key_index_cache, write_generations
+from src.utils.sheet_metadata import metadata_cache
+from src.utils.write_hooks import notify_spreadsheet_written
+from src.utils.write_jobs import register_job_runner, submit_job, job_accepted_response
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -22,6 +29,37 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 SERVICE_ACCOUNT_FILE = "/usr/src/app/quail-asset-7c70b02f0362.json"
 router = Router()
 
+# Keep each values.batchUpdate body under the recommended ~2MB request size
+MAX_BATCH_PAYLOAD_BYTES = 2 * 1024 * 1024
+MAX_BATCH_RANGES = 1000
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upsert-append")
+
+
+class UpsertWriteError(Exception):
+    """
+    The updates, the append or both failed. Both run concurrently, so the
+    other may still have been applied; the message reports each outcome.
+    """
+
+    def __init__(self, update_error, append_error, updated_written, updated_total, inserted, appended):
+        self.update_error = update_error
+        self.append_error = append_error
+        self.updated_written = updated_written
+        self.updated_total = updated_total
+        self.inserted = inserted
+        self.appended = appended
+        if update_error is not None:
+            update_outcome = f"updating existing rows failed after {updated_written} of {updated_total} rows: {update_error}"
+        else:
+            update_outcome = f"all {updated_total} existing rows were updated"
+        if append_error is not None:
+            append_outcome = f"appending {inserted} new rows failed: {append_error}"
+        elif inserted:
+            append_outcome = f"{inserted} new rows were appended"
+        else:
+            append_outcome = "no new rows to append"
+        super().__init__(f"Upsert failed: {update_outcome}; {append_outcome}")
+
 def parse_data_to_upsert(data_raw):
     try:
         if isinstance(data_raw, str):
@@ -37,72 +75,180 @@ def parse_data_to_upsert(data_raw):
         logger.error(f"Error parsing data to upsert: {e}")
         raise ValueError(f"Invalid data to upsert: {str(e)}")
 
-def get_sheet_data(service, spreadsheet_id, sheet_name):
+def get_key_column_values(service, spreadsheet_id, sheet_name, key_idx):
+    # Only the key column below the header, as one column-major array
+    letter = column_letter(key_idx + 1)
     try:
         result = service.spreadsheets().values().get(
             spreadsheetId=spreadsheet_id,
-            range=sheet_name
+            range=f"{quote_sheet_name(sheet_name)}!{letter}2:{letter}",
+            majorDimension='COLUMNS',
+            fields='values'
         ).execute()
         values = result.get('values', [])
-        return values
+        return values[0] if values else []
     except Exception as e:
-        logger.error(f"Error reading sheet data: {e}")
+        logger.error(f"Error reading key column: {e}")
+        raise
+
+def build_key_index(key_values, key_column):
+    key_to_row = {}
+    for idx, value in enumerate(key_values, start=2):
+        key_val = str(value).strip()
+        if not key_val or key_val == key_column:
+            continue
+        key_to_row[key_val] = idx
+    return key_to_row
+
+def chunk_value_ranges(value_ranges, max_bytes=MAX_BATCH_PAYLOAD_BYTES, max_ranges=MAX_BATCH_RANGES):
+    chunk = []
+    chunk_bytes = 0
+    for value_range in value_ranges:
+        size = len(json.dumps(value_range))
+        if chunk and (chunk_bytes + size > max_bytes or len(chunk) >= max_ranges):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(value_range)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+def append_rows(spreadsheet_id, sheet_name, append_values):
+    with sheets_service() as service:
+        return service.spreadsheets().values().append(
+            spreadsheetId=spreadsheet_id,
+            range=sheet_name,
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body={'values': append_values}
+        ).execute()
+
+def upsert_rows(service, spreadsheet_id, sheet_name, key_column, data_to_upsert, report_progress=None):
+    cache_key = (spreadsheet_id, sheet_name, key_column)
+    index = key_index_cache.get(cache_key)
+    if index is None:
+        index = load_key_index(service, spreadsheet_id, sheet_name, key_column)
+    try:
+        result = write_upsert(service, spreadsheet_id, sheet_name, index, data_to_upsert, report_progress)
+    except Exception:
+        metadata_cache.invalidate(spreadsheet_id)
+        notify_spreadsheet_written(spreadsheet_id)
         raise
+    # Drops every cached index for the spreadsheet, this one included
+    generation = notify_spreadsheet_written(spreadsheet_id)
+    if index.generation is not None and generation == index.generation + 1:
+        # No other write since the key column was read, so this index only
+        # lacks our own appends
+        current = result['append_response'] is None or key_index_cache.apply_append(
+            cache_key, index,
+            result['append_response'].get('updates', {}).get('updatedRange', ''),
+            result['append_values']
+        )
+        if current:
+            index.generation = generation
+            key_index_cache.put(cache_key, index)
+    return {
+        'updated': result['updated'],
+        'inserted': result['inserted'],
+        'total': len(data_to_upsert)
+    }
 
-def upsert_rows(service, spreadsheet_id, sheet_name, key_column, data_to_upsert):
-    sheet_data = get_sheet_data(service, spreadsheet_id, sheet_name)
-    if not sheet_data or not sheet_data[0]:
+def load_key_index(service, spreadsheet_id, sheet_name, key_column):
+    # Read before the key column, so a write racing the read leaves the index stale
+    generation = write_generations.current(spreadsheet_id)
+    try:
+        headers = metadata_cache.get_headers(service, spreadsheet_id, sheet_name)
+    except Exception as e:
+        logger.error(f"Error reading sheet headers: {e}")
+        raise
+    if not headers:
         raise ValueError("Sheet is empty or missing headers")
-    headers = sheet_data[0]
     key_idx = None
     try:
         key_idx = headers.index(key_column)
     except ValueError:
         raise ValueError(f"Key column '{key_column}' not found in sheet headers: {headers}")
-    key_to_row = {}
-    for idx, row in enumerate(sheet_data[1:], start=2):
-        if len(row) > key_idx:
-            key_val = str(row[key_idx]).strip()
-            if not key_val or key_val == key_column:
-                continue
-            key_to_row[key_val] = idx
+    key_values = get_key_column_values(service, spreadsheet_id, sheet_name, key_idx)
+    key_to_row = build_key_index(key_values, key_column)
+    return KeyIndex(headers, key_column, key_to_row, last_row=len(key_values) + 1, generation=generation)
+
+def write_upsert(service, spreadsheet_id, sheet_name, index, data_to_upsert, report_progress=None):
+    headers = index.headers
+    key_column = index.key_column
+    key_to_row = index.key_to_row
     update_requests = []
     append_values = []
+    last_column = column_letter(len(headers))
     for obj in data_to_upsert:
         key_val = str(obj.get(key_column, "")).strip()
-        if key_val is None:
-            continue
         row_values = [obj.get(h, "") for h in headers]
         if key_val in key_to_row:
             row_number = key_to_row[key_val]
-            rng = f"{sheet_name}!A{row_number}:{chr(65+len(headers)-1)}{row_number}"
+            rng = f"{quote_sheet_name(sheet_name)}!A{row_number}:{last_column}{row_number}"
             update_requests.append({
                 'range': rng,
                 'values': [row_values]
             })
         else:
             append_values.append(row_values)
-    for req in update_requests:
-        service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range=req['range'],
-            valueInputOption='RAW',
-            body={'values': req['values']}
-        ).execute()
+    # Updates only touch existing rows and the append only adds rows after the
+    # table, so the append runs on its own pooled client alongside the updates
+    append_future = None
     if append_values:
-        service.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range=sheet_name,
-            valueInputOption='RAW',
-            insertDataOption='INSERT_ROWS',
-            body={'values': append_values}
-        ).execute()
+        append_future = _executor.submit(append_rows, spreadsheet_id, sheet_name, append_values)
+    updated_written = 0
+    update_error = None
+    try:
+        for chunk in chunk_value_ranges(update_requests):
+            service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'valueInputOption': 'RAW', 'data': chunk}
+            ).execute()
+            updated_written += len(chunk)
+            if report_progress is not None:
+                report_progress({
+                    'updated_rows_written': updated_written,
+                    'updated_rows_total': len(update_requests),
+                    'rows_to_insert': len(append_values)
+                })
+    except Exception as e:
+        update_error = e
+    # Always wait for the append, so neither outcome hides the other
+    append_response = None
+    append_error = None
+    if append_future is not None:
+        try:
+            append_response = append_future.result()
+        except Exception as e:
+            append_error = e
+    if update_error is not None or append_error is not None:
+        raise UpsertWriteError(
+            update_error, append_error, updated_written, len(update_requests),
+            len(append_values), append_future is not None and append_error is None
+        ) from (update_error or append_error)
     return {
         'updated': len(update_requests),
         'inserted': len(append_values),
-        'total': len(data_to_upsert)
+        'append_values': append_values,
+        'append_response': append_response
     }
 
+def run_upsert_job(payload, report_progress):
+    with sheets_service() as service:
+        result = upsert_rows(
+            service, payload['spreadsheet_id'], payload['sheet_name'], payload['key_column'],
+            payload['data_to_upsert'], report_progress
+        )
+    return {
+        "message": f"Upsert complete: {result['updated']} updated, {result['inserted']} inserted.",
+        "updated": result['updated'],
+        "inserted": result['inserted'],
+        "total": result['total']
+    }
+
+register_job_runner("UPSERT", run_upsert_job)
+
 @router.route("/execute", methods=["GET", "POST"])
 def execute():
     logger.info("=== UPSERT EXECUTE START ===")
@@ -115,6 +261,7 @@ def execute():
         key_column = form_data.get("key_column")
         data_to_upsert_raw = form_data.get("data_to_upsert", "")
         confirm_upsert = form_data.get("confirm_upsert", False)
+        async_mode = form_data.get("async_mode", False)
         if not spreadsheet_id:
             return Response(data={"error": "Spreadsheet ID is required"}, metadata={"status": "error"})
         if not sheet_name:
@@ -129,9 +276,37 @@ def execute():
             data_to_upsert = parse_data_to_upsert(data_to_upsert_raw)
         except Exception as e:
             return Response(data={"error": str(e)}, metadata={"status": "error"})
+        circuit = circuit_breaker.check(spreadsheet_id)
+        if circuit:
+            logger.error(f"Circuit open for spreadsheet {spreadsheet_id}: {circuit['reason']}")
+            return Response(data={"error": circuit["message"], "circuit": circuit}, metadata={"status": "error", "circuit_state": circuit["state"]})
+        if async_mode:
+            try:
+                job = submit_job("UPSERT", {
+                    "spreadsheet_id": spreadsheet_id,
+                    "sheet_name": sheet_name,
+                    "key_column": key_column,
+                    "data_to_upsert": data_to_upsert
+                })
+            except Exception as e:
+                logger.error(f"Failed to queue upsert job: {e}")
+                return Response(data={"error": f"Failed to queue upsert job: {str(e)}"}, metadata={"status": "error"})
+            return job_accepted_response(job)
         try:
             service = get_google_sheets_service()
             result = upsert_rows(service, spreadsheet_id, sheet_name, key_column, data_to_upsert)
+        except UpsertWriteError as e:
+            logger.error(f"Upsert error: {e}")
+            return Response(
+                data={
+                    "error": str(e),
+                    "updated_rows_written": e.updated_written,
+                    "updated_rows_total": e.updated_total,
+                    "rows_to_insert": e.inserted,
+                    "inserted_rows_appended": e.appended
+                },
+                metadata={"status": "error"}
+            )
         except Exception as e:
             logger.error(f"Upsert error: {e}")
             return Response(data={"error": str(e)}, metadata={"status": "error"})
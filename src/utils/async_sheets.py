@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from urllib.parse import quote, urlencode
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from src.utils.circuit_breaker import circuit_breaker, BREAKER_ENABLED
+from src.utils.google_sheets import get_access_credentials
+from src.utils.http_transport import CONNECT_TIMEOUT, READ_TIMEOUT
+from src.utils.quota_scheduler import quota_scheduler, classify_request, SCHEDULER_ENABLED
+from src.utils.retry import (
+    RETRY_ENABLED, MAX_ATTEMPTS, DEADLINE_SECONDS, CONNECT_FAILED, NETWORK, UNKNOWN, classify_status,
+    classify_exception, is_idempotent, should_retry, parse_retry_after, backoff_delay, record_retry_stat,
+    record_error_class
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# Point at a local fake Sheets server in tests
+API_BASE_URL = os.environ.get("SHEETS_API_BASE_URL", "https://sheets.googleapis.com").rstrip('/')
+# Connections shared by every coroutine in the process; calls beyond this queue for a free one
+ASYNC_POOL_SIZE = int(os.environ.get("SHEETS_ASYNC_POOL_SIZE", "100"))
+ASYNC_CLIENT_ENABLED = os.environ.get("SHEETS_ASYNC_CLIENT", "true").lower() == "true"
+
+if ASYNC_CLIENT_ENABLED and aiohttp is None:
+    logger.warning("SHEETS_ASYNC_CLIENT is on but aiohttp is not installed, using the thread pool")
+    ASYNC_CLIENT_ENABLED = False
+
+_loop_lock = threading.Lock()
+_loop = None
+_loop_pid = None
+_clients = {}
+# Set by reserve_quota(): the next call in this task has already waited for quota
+_quota_reserved = contextvars.ContextVar("sheets_quota_reserved", default=False)
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_event_loop():
+    """
+    The process's background event loop, started on first use. Threads do not
+    survive a fork, so each worker starts its own.
+    """
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _clients.clear()
+            threading.Thread(target=_run_loop, args=(_loop,), name="sheets-async", daemon=True).start()
+        return _loop
+
+
+def submit(coro):
+    """
+    Schedule a coroutine on the background loop from any thread; returns a
+    concurrent.futures.Future whose cancel() also cancels the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_sync(coro, timeout=None):
+    """
+    Block the calling (request) thread until the coroutine finishes
+    """
+    return submit(coro).result(timeout)
+
+
+def run_async(coro):
+    """
+    Await a client call from a coroutine running on some other event loop,
+    e.g. an async view handler
+    """
+    return asyncio.wrap_future(submit(coro))
+
+
+async def reserve_quota(spreadsheet_id, kind):
+    """
+    Wait for quota now for the next client call made in this task (or in
+    tasks started from it), so the caller can time the call itself
+    separately from its queueing for quota
+    """
+    if SCHEDULER_ENABLED:
+        await quota_scheduler.acquire_async(spreadsheet_id, kind)
+        _quota_reserved.set(True)
+
+
+def _query_string(params):
+    query = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        query[name] = value
+    return urlencode(query, doseq=True)
+
+
+def classify_client_error(error):
+    """
+    classify_exception that also knows aiohttp's exceptions
+    """
+    if aiohttp is None:
+        return classify_exception(error)
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return CONNECT_FAILED
+    error_class = classify_exception(error)
+    if error_class == UNKNOWN and isinstance(error, aiohttp.ClientError):
+        return NETWORK
+    return error_class
+
+
+class AsyncSheetsClient:
+    """
+    asyncio client for the Sheets v4 endpoints the modules use, sharing one
+    aiohttp connection pool per process.
+
+    Calls go through the same pipeline as the googleapiclient transport:
+    quota scheduler before each attempt, retry on transient failures (only
+    when not-applied for non-idempotent calls), final status reported to the
+    circuit breaker. Error responses raise googleapiclient's HttpError, so
+    callers handle them exactly like errors from .execute().
+
+    Must be used from the background loop (see submit / run_sync / run_async).
+    """
+
+    def __init__(self, readonly=False, base_url=API_BASE_URL, pool_size=ASYNC_POOL_SIZE,
+                 max_attempts=MAX_ATTEMPTS, deadline_seconds=DEADLINE_SECONDS):
+        self.readonly = readonly
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts if RETRY_ENABLED else 1
+        self.deadline_seconds = deadline_seconds
+        self._session = None
+        self._credentials = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+            )
+        return self._session
+
+    async def _authorization(self):
+        credentials = self._credentials
+        if credentials is None or not credentials.valid:
+            # Reads the key file and may refresh the token, both blocking
+            credentials = await asyncio.get_running_loop().run_in_executor(
+                None, get_access_credentials, self.readonly
+            )
+            self._credentials = credentials
+        return f"Bearer {credentials.token}"
+
+    async def _send(self, method, uri, body):
+        headers = {"Authorization": await self._authorization(), "Accept": "application/json"}
+        data = None
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            data = json.dumps(body)
+        async with self._get_session().request(method, uri, data=data, headers=headers) as response:
+            content = await response.read()
+            info = {k.lower(): v for k, v in response.headers.items()}
+            info['status'] = str(response.status)
+            return httplib2.Response(info), content
+
+    async def request(self, method, path, params=None, body=None):
+        uri = f"{self.base_url}{path}"
+        query = _query_string(params or {})
+        if query:
+            uri = f"{uri}?{query}"
+        deadline = time.time() + self.deadline_seconds
+        idempotent = is_idempotent(uri, method)
+        record_retry_stat("calls")
+        attempt = 0
+        while True:
+            if SCHEDULER_ENABLED:
+                if attempt == 0 and _quota_reserved.get():
+                    _quota_reserved.set(False)
+                else:
+                    await quota_scheduler.acquire_for_request_async(uri, method, deadline)
+            error = None
+            retry_after = None
+            try:
+                response, content = await self._send(method, uri, body)
+            except Exception as e:
+                error = e
+                error_class = classify_client_error(e)
+            else:
+                if response.status < 400:
+                    if attempt:
+                        record_retry_stat("recovered")
+                    self._record_status(uri, method, response.status)
+                    return json.loads(content) if content else {}
+                if response.status == 401:
+                    # Token revoked or rotated: fetch a fresh one next time
+                    self._credentials = None
+                error_class = classify_status(response.status)
+                retry_after = parse_retry_after(response.get('retry-after'))
+            record_error_class(error_class)
+            attempt += 1
+            delay = backoff_delay(attempt - 1, retry_after)
+            if (not should_retry(error_class, idempotent) or attempt >= self.max_attempts
+                    or time.time() + delay > deadline):
+                if should_retry(error_class, idempotent) and RETRY_ENABLED:
+                    record_retry_stat("gave_up")
+                if error is not None:
+                    raise error
+                self._record_status(uri, method, response.status)
+                raise HttpError(response, content, uri=uri)
+            record_retry_stat("retries")
+            logger.warning(
+                f"Retrying {method} {path} after {error_class} "
+                f"(attempt {attempt + 1}/{self.max_attempts}) in {round(delay, 2)}s"
+            )
+            await asyncio.sleep(delay)
+
+    def _record_status(self, uri, method, status):
+        if not BREAKER_ENABLED:
+            return
+        classified = classify_request(uri, method)
+        if classified is not None:
+            circuit_breaker.record_status(classified[0], status)
+
+    def _values_path(self, spreadsheet_id, range_name, suffix=""):
+        return f"/v4/spreadsheets/{quote(spreadsheet_id, safe='')}/values/{quote(range_name, safe='')}{suffix}"
+
+    async def get(self, spreadsheet_id, **params):
+        return await self.request("GET", f"/v4/spreadsheets/{quote(spreadsheet_id, safe='')}", params)
+
+    async def batch_update(self, spreadsheet_id, body):
+        return await self.request("POST", f"/v4/spreadsheets/{quote(spreadsheet_id, safe='')}:batchUpdate", body=body)
+
+    async def values_get(self, spreadsheet_id, range_name, **params):
+        return await self.request("GET", self._values_path(spreadsheet_id, range_name), params)
+
+    async def values_batch_get(self, spreadsheet_id, ranges, **params):
+        params["ranges"] = list(ranges)
+        return await self.request("GET", f"/v4/spreadsheets/{quote(spreadsheet_id, safe='')}/values:batchGet", params)
+
+    async def values_update(self, spreadsheet_id, range_name, body, **params):
+        return await self.request("PUT", self._values_path(spreadsheet_id, range_name), params, body)
+
+    async def values_batch_update(self, spreadsheet_id, body):
+        return await self.request(
+            "POST", f"/v4/spreadsheets/{quote(spreadsheet_id, safe='')}/values:batchUpdate", body=body
+        )
+
+    async def values_append(self, spreadsheet_id, range_name, body, **params):
+        return await self.request("POST", self._values_path(spreadsheet_id, range_name, ":append"), params, body)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+def get_async_client(readonly=False):
+    """
+    The process's shared client for a scope; coroutines on the background
+    loop may use it concurrently
+    """
+    if not ASYNC_CLIENT_ENABLED:
+        raise RuntimeError("The async Sheets client needs aiohttp and SHEETS_ASYNC_CLIENT=true")
+    get_event_loop()
+    with _loop_lock:
+        client = _clients.get(readonly)
+        if client is None:
+            client = _clients[readonly] = AsyncSheetsClient(readonly)
+        return client
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import sqlite3
+import itertools
+
+from src.utils.local_store import connect
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DB = "snapshots.db"
+# Cursors older than this expire, whoever created them; consumers of the
+# same range each keep their own cursors until then
+SNAPSHOT_TTL_SECONDS = float(os.environ.get("SHEETS_CHANGE_SNAPSHOT_TTL", str(7 * 24 * 3600)))
+DIGEST_SIZE = 16
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _init(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        "cursor TEXT PRIMARY KEY, scope TEXT NOT NULL, created_at REAL NOT NULL, row_count INTEGER NOT NULL, "
+        "complete INTEGER NOT NULL DEFAULT 1)"
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(snapshots)")}
+    # Snapshot stores created before snapshots were written in chunks
+    if "complete" not in columns:
+        conn.execute("ALTER TABLE snapshots ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS snapshots_scope ON snapshots (scope, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS snapshots_created ON snapshots (created_at)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS snapshot_rows ("
+        "cursor TEXT NOT NULL, row_key TEXT NOT NULL, row_number INTEGER NOT NULL, digest BLOB NOT NULL, "
+        "PRIMARY KEY (cursor, row_key)) WITHOUT ROWID"
+    )
+
+
+def row_digest(row):
+    return hashlib.blake2b(json.dumps(row, separators=(',', ':')).encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def _prune(conn, keep_cursor):
+    # Also clears snapshots left incomplete by a worker that died mid-read
+    stale = conn.execute(
+        "SELECT cursor FROM snapshots WHERE created_at < ? AND cursor != ?",
+        (time.time() - SNAPSHOT_TTL_SECONDS, keep_cursor)
+    ).fetchall()
+    for (cursor,) in stale:
+        conn.execute("DELETE FROM snapshot_rows WHERE cursor = ?", (cursor,))
+        conn.execute("DELETE FROM snapshots WHERE cursor = ?", (cursor,))
+
+
+def _duplicate_key_error(key, row_numbers):
+    rows = " and ".join(str(row_number) for row_number in sorted(row_numbers))
+    return ValueError(
+        f"Key '{key}' appears in rows {rows}; the key column must be unique to track changes"
+    )
+
+
+def _store_chunk(conn, cursor, chunk):
+    seen = {}
+    for key, row_number, _, _ in chunk:
+        if key in seen:
+            raise _duplicate_key_error(key, [seen[key], row_number])
+        seen[key] = row_number
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT INTO snapshot_rows (cursor, row_key, row_number, digest) VALUES (?, ?, ?, ?)",
+            ((cursor, key, row_number, digest) for key, row_number, _, digest in chunk)
+        )
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        # The key was already stored from an earlier chunk
+        placeholders = ",".join("?" * len(chunk))
+        key, earlier_row = conn.execute(
+            f"SELECT row_key, row_number FROM snapshot_rows WHERE cursor = ? AND row_key IN ({placeholders}) LIMIT 1",
+            [cursor] + list(seen)
+        ).fetchone()
+        raise _duplicate_key_error(key, [earlier_row, seen[key]])
+    conn.commit()
+
+
+def _discard(conn, cursor):
+    try:
+        conn.rollback()
+        conn.execute("DELETE FROM snapshot_rows WHERE cursor = ?", (cursor,))
+        conn.execute("DELETE FROM snapshots WHERE cursor = ?", (cursor,))
+        conn.commit()
+    except sqlite3.Error as e:
+        # Pruned once it expires
+        logger.error(f"Failed to discard incomplete snapshot {cursor}: {e}")
+
+
+def compute_changes(scope, previous_cursor, rows, key_index=None):
+    """
+    Diff `rows`, an iterable of (row_number, row), against the snapshot stored
+    under `previous_cursor` and store them as a new snapshot.
+
+    Only fixed-width digests are stored, never cell values. Rows are read in
+    chunks; each chunk is compared against the previous snapshot and written
+    to the new one on disk, and deletions are found by a query between the
+    two snapshots, so memory holds one chunk plus the changed rows whatever
+    the sheet's size. Rows are keyed by the value in `key_index` when given
+    (falling back to the row number for blank keys), otherwise by row number;
+    a key found in two rows raises ValueError.
+
+    `rows` usually pulls pages from Google as it is consumed, so no write
+    transaction is held while it is read: each chunk is written in its own
+    short transaction under a snapshot that stays hidden until complete.
+
+    Returns (changes, new_cursor). Without a previous cursor every row is
+    reported as inserted.
+    """
+    conn = connect(SNAPSHOT_DB)
+    new_cursor = None
+    try:
+        _init(conn)
+        conn.commit()
+        if previous_cursor:
+            found = conn.execute(
+                "SELECT 1 FROM snapshots WHERE cursor = ? AND scope = ? AND complete = 1", (previous_cursor, scope)
+            ).fetchone()
+            if not found:
+                raise ValueError("Unknown or expired cursor; start a new sync without one")
+        new_cursor = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO snapshots (cursor, scope, created_at, row_count, complete) VALUES (?, ?, ?, 0, 0)",
+            (new_cursor, scope, time.time())
+        )
+        conn.commit()
+        changes = {"inserted": [], "modified": [], "deleted": []}
+        row_count = 0
+        rows = iter(rows)
+        while True:
+            chunk = []
+            for row_number, row in itertools.islice(rows, LOOKUP_CHUNK_SIZE):
+                key = None
+                if key_index is not None and key_index < len(row) and str(row[key_index]).strip():
+                    key = str(row[key_index]).strip()
+                chunk.append((key if key is not None else f"#{row_number}", row_number, row, row_digest(row)))
+            if not chunk:
+                break
+            _store_chunk(conn, new_cursor, chunk)
+            row_count += len(chunk)
+            previous = {}
+            if previous_cursor:
+                placeholders = ",".join("?" * len(chunk))
+                previous = dict(conn.execute(
+                    f"SELECT row_key, digest FROM snapshot_rows WHERE cursor = ? AND row_key IN ({placeholders})",
+                    [previous_cursor] + [item[0] for item in chunk]
+                ).fetchall())
+            for key, row_number, row, digest in chunk:
+                old_digest = previous.get(key)
+                if old_digest is None:
+                    changes["inserted"].append({"key": key, "row_number": row_number, "values": row})
+                elif old_digest != digest:
+                    changes["modified"].append({"key": key, "row_number": row_number, "values": row})
+        if previous_cursor:
+            changes["deleted"] = [
+                {"key": key, "row_number": row_number}
+                for key, row_number in conn.execute(
+                    "SELECT old.row_key, old.row_number FROM snapshot_rows AS old WHERE old.cursor = ? AND NOT EXISTS "
+                    "(SELECT 1 FROM snapshot_rows AS new WHERE new.cursor = ? AND new.row_key = old.row_key)",
+                    (previous_cursor, new_cursor)
+                )
+            ]
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE snapshots SET complete = 1, row_count = ?, created_at = ? WHERE cursor = ?",
+            (row_count, time.time(), new_cursor)
+        )
+        _prune(conn, new_cursor)
+        conn.commit()
+        return changes, new_cursor
+    except Exception:
+        if new_cursor is not None:
+            _discard(conn, new_cursor)
+        else:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
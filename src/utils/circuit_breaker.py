@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+BREAKER_ENABLED = os.environ.get("SHEETS_BREAKER_ENABLED", "true").lower() == "true"
+FAILURE_THRESHOLD = int(os.environ.get("SHEETS_BREAKER_FAILURE_THRESHOLD", "5"))
+OPEN_SECONDS = float(os.environ.get("SHEETS_BREAKER_OPEN_SECONDS", "30"))
+# Each failed probe doubles the open period up to this
+MAX_OPEN_SECONDS = float(os.environ.get("SHEETS_BREAKER_MAX_OPEN_SECONDS", "600"))
+# A probe that never reports back frees its slot after this long
+PROBE_TIMEOUT_SECONDS = 60
+
+# Failures that say the spreadsheet itself is unusable right now
+TRIP_STATUSES = {403: "permission", 404: "not_found", 429: "rate_limited"}
+TRIP_MESSAGES = {
+    "permission": "the service account has lost access to it",
+    "not_found": "it was not found",
+    "rate_limited": "its quota is exhausted"
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.reason = None
+        self.opened_at = 0.0
+        self.open_seconds = OPEN_SECONDS
+        self.probe_started_at = None
+
+
+class CircuitBreaker:
+    """
+    Per-spreadsheet circuit breaker, per worker process.
+
+    Handlers call check() before doing any work; the transport calls
+    record_status() with the outcome of every API call. After
+    FAILURE_THRESHOLD consecutive 403/404/429 responses the circuit opens and
+    calls fail fast. Once the open period ends one request at a time is let
+    through as a probe: success closes the circuit, another tripping failure
+    reopens it for twice as long.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS,
+                 max_open_seconds=MAX_OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self._circuits = {}
+        self._lock = threading.Lock()
+        self.stats = {"rejected": 0, "trips": 0, "probes": 0, "recoveries": 0}
+
+    def check(self, spreadsheet_id):
+        """
+        None when the call may proceed, otherwise a dict describing the open circuit
+        """
+        if not BREAKER_ENABLED:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuits.get(spreadsheet_id)
+            if circuit is None or circuit.state == CLOSED:
+                return None
+            retry_in = circuit.opened_at + circuit.open_seconds - now
+            if retry_in <= 0:
+                probe_free = circuit.probe_started_at is None or now - circuit.probe_started_at > PROBE_TIMEOUT_SECONDS
+                if probe_free:
+                    circuit.state = HALF_OPEN
+                    circuit.probe_started_at = now
+                    self.stats["probes"] += 1
+                    logger.info(f"Circuit for spreadsheet {spreadsheet_id} half-open, sending probe")
+                    return None
+            self.stats["rejected"] += 1
+            return {
+                "state": circuit.state,
+                "reason": circuit.reason,
+                "retry_after_seconds": round(max(retry_in, 0), 1),
+                "message": (
+                    f"Requests to spreadsheet {spreadsheet_id} are paused because "
+                    f"{TRIP_MESSAGES.get(circuit.reason, 'it keeps failing')}. "
+                    f"Retry in {max(int(retry_in) + 1, 1)}s."
+                )
+            }
+
+    def record_status(self, spreadsheet_id, status):
+        if not BREAKER_ENABLED:
+            return
+        reason = TRIP_STATUSES.get(status)
+        if reason is None and status >= 500:
+            # Server errors say nothing about this spreadsheet
+            return
+        with self._lock:
+            circuit = self._circuits.get(spreadsheet_id)
+            if reason is None:
+                if circuit is not None:
+                    if circuit.state != CLOSED:
+                        self.stats["recoveries"] += 1
+                        logger.info(f"Circuit for spreadsheet {spreadsheet_id} closed")
+                    del self._circuits[spreadsheet_id]
+                return
+            if circuit is None:
+                circuit = self._circuits[spreadsheet_id] = _Circuit()
+                circuit.open_seconds = self.open_seconds
+            circuit.failures += 1
+            circuit.reason = reason
+            if circuit.state == HALF_OPEN:
+                circuit.open_seconds = min(circuit.open_seconds * 2, self.max_open_seconds)
+                self._open(spreadsheet_id, circuit)
+            elif circuit.state == CLOSED and circuit.failures >= self.failure_threshold:
+                self._open(spreadsheet_id, circuit)
+
+    def _open(self, spreadsheet_id, circuit):
+        # Caller holds self._lock
+        circuit.state = OPEN
+        circuit.opened_at = time.monotonic()
+        circuit.probe_started_at = None
+        self.stats["trips"] += 1
+        logger.error(
+            f"Circuit for spreadsheet {spreadsheet_id} opened for {circuit.open_seconds}s "
+            f"after {circuit.failures} {circuit.reason} failures"
+        )
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["open_circuits"] = {
+                spreadsheet_id: {"state": circuit.state, "reason": circuit.reason, "failures": circuit.failures}
+                for spreadsheet_id, circuit in self._circuits.items() if circuit.state != CLOSED
+            }
+        return stats
+
+
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+from src.utils.async_sheets import submit, reserve_quota, classify_client_error, ASYNC_POOL_SIZE
+from src.utils.circuit_breaker import circuit_breaker
+from src.utils.retry import classify_exception
+
+logger = logging.getLogger(__name__)
+
+# Shared by all fan-out requests in a worker, so concurrent reports cannot
+# multiply the number of in-flight Sheets calls
+FANOUT_WORKERS = int(os.environ.get("SHEETS_FANOUT_WORKERS", "8"))
+FANOUT_TARGET_TIMEOUT_SECONDS = float(os.environ.get("SHEETS_FANOUT_TARGET_TIMEOUT", "30"))
+MAX_FANOUT_TARGETS = int(os.environ.get("SHEETS_FANOUT_MAX_TARGETS", "500"))
+# Async targets running at once, shared by all fan-outs in the worker. Quota
+# pacing happens per target in reserve_quota, so this only bounds open
+# connections and defaults to the async client's pool.
+FANOUT_ASYNC_CONCURRENCY = int(os.environ.get("SHEETS_FANOUT_ASYNC_CONCURRENCY", str(ASYNC_POOL_SIZE)))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fan-out")
+# (loop, semaphore) for FANOUT_ASYNC_CONCURRENCY, rebuilt when a forked
+# worker starts a new loop
+_async_slots = (None, None)
+
+
+def _result(index, target, outcome):
+    result = {"index": index}
+    result.update(target)
+    result.update(outcome)
+    return result
+
+
+def _timeout_outcome(target_timeout):
+    return {"status": "error", "error": f"Timed out after {target_timeout}s", "error_class": "timeout"}
+
+
+def _error_outcome(target, error, classify=classify_exception):
+    logger.error(f"Fan-out target {target} failed: {error}")
+    return {"status": "error", "error": str(error), "error_class": classify(error)}
+
+
+def _success_outcome(outcome):
+    outcome = dict(outcome)
+    outcome.setdefault("status", "success")
+    return outcome
+
+
+def iter_fan_out(targets, fetch, target_timeout=FANOUT_TARGET_TIMEOUT_SECONDS):
+    """
+    Run fetch(target) for every target on the shared pool and yield one result
+    dict per target as each completes. A target's timeout counts from when it
+    starts running, not from when it was queued; a timed-out call is reported
+    and abandoned, and finishes in the background.
+    """
+    started = {}
+
+    def run(index, target):
+        started[index] = time.monotonic()
+        return fetch(target)
+
+    futures = {_executor.submit(run, index, target): index for index, target in enumerate(targets)}
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                if index in started and not future.done() and now - started[index] > target_timeout:
+                    pending.discard(future)
+                    yield _result(index, targets[index], _timeout_outcome(target_timeout))
+            if not pending:
+                break
+            deadlines = [started[futures[future]] + target_timeout for future in pending if futures[future] in started]
+            wait_for = min(deadlines) - now if deadlines else target_timeout
+            done, _ = wait(pending, timeout=max(wait_for, 0.05), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                index = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = _error_outcome(targets[index], e)
+                else:
+                    outcome = _success_outcome(outcome)
+                yield _result(index, targets[index], outcome)
+    finally:
+        # The caller went away or finished early: drop work that has not started
+        for future in pending:
+            future.cancel()
+
+
+def _get_async_slots():
+    global _async_slots
+    loop = asyncio.get_running_loop()
+    if _async_slots[0] is not loop:
+        _async_slots = (loop, asyncio.Semaphore(max(FANOUT_ASYNC_CONCURRENCY, 1)))
+    return _async_slots[1]
+
+
+def iter_fan_out_async(targets, fetch, target_timeout=FANOUT_TARGET_TIMEOUT_SECONDS):
+    """
+    iter_fan_out for a coroutine fetch(target) that makes one Sheets read,
+    on the background event loop. Targets start as quota allows rather than
+    on a fixed number of threads, and a target's timeout counts from when its
+    read is admitted by the quota scheduler, not from when it was queued. A
+    timed-out call is cancelled rather than abandoned.
+
+    The spreadsheet's circuit is checked here, before quota is reserved, so
+    fetch must not check it again (that would use up a half-open probe).
+    """
+    async def run(target):
+        async with _get_async_slots():
+            circuit = circuit_breaker.check(target["spreadsheet_id"])
+            if circuit:
+                return {"status": "error", "error": circuit["message"], "error_class": "circuit_open"}
+            await reserve_quota(target["spreadsheet_id"], "read")
+            return await asyncio.wait_for(fetch(target), target_timeout)
+
+    futures = {submit(run(target)): index for index, target in enumerate(targets)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                outcome = future.result()
+            except asyncio.TimeoutError:
+                outcome = _timeout_outcome(target_timeout)
+            except Exception as e:
+                outcome = _error_outcome(targets[index], e, classify_client_error)
+            else:
+                outcome = _success_outcome(outcome)
+            yield _result(index, targets[index], outcome)
+    finally:
+        for future in futures:
+            future.cancel()
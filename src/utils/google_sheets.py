@@ -1,14 +1,39 @@
 import os
+import re
 import json
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from flask import g, has_app_context
+import google.auth.transport.requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-import google_auth_httplib2
+
+from src.utils.http_transport import build_authorized_http
+from src.utils.token_manager import TOKEN_MANAGER_ENABLED, get_token_manager
+
+logger = logging.getLogger(__name__)
 
 SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/spreadsheets.readonly'
 ]
 SERVICE_ACCOUNT_FILE = "/usr/src/app/quail-asset-7c70b02f0362.json"
+CLIENT_POOL_SIZE = int(os.environ.get("SHEETS_CLIENT_POOL_SIZE", "16"))
+CLIENT_CHECKOUT_TIMEOUT = float(os.environ.get("SHEETS_CLIENT_CHECKOUT_TIMEOUT", "30"))
+
+# Process-wide caches. Credentials (and the access tokens they hold) and a pool
+# of discovery-backed clients are kept per (credential identity, scope) and
+# reused across requests instead of being rebuilt on every /execute call.
+_cache_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_service_account_info_cache = {}
+_credentials_cache = {}
+_service_cache = {}
+_thread_local = threading.local()
+_cache_stats = {"hits": 0, "misses": 0}
+
 
 def get_service_account_info():
     if os.path.exists(SERVICE_ACCOUNT_FILE):
@@ -17,10 +42,246 @@ def get_service_account_info():
     else:
         raise ValueError(f"Service account file not found: {SERVICE_ACCOUNT_FILE}")
 
+
+def _get_cached_service_account_info():
+    # Only re-read the key file when it changes on disk
+    try:
+        mtime = os.stat(SERVICE_ACCOUNT_FILE).st_mtime
+    except OSError:
+        raise ValueError(f"Service account file not found: {SERVICE_ACCOUNT_FILE}")
+    cached = _service_account_info_cache.get(SERVICE_ACCOUNT_FILE)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    info = get_service_account_info()
+    _service_account_info_cache[SERVICE_ACCOUNT_FILE] = (mtime, info)
+    return info
+
+
+def get_scope(readonly=False):
+    return 'https://www.googleapis.com/auth/spreadsheets.readonly' if readonly else 'https://www.googleapis.com/auth/spreadsheets'
+
+
+def get_credential_identity(service_account_info):
+    return f"{service_account_info.get('client_email', '')}:{service_account_info.get('private_key_id', '')}"
+
+
+def get_cached_credentials(service_account_info, scope):
+    key = (get_credential_identity(service_account_info), scope)
+    with _cache_lock:
+        credentials = _credentials_cache.get(key)
+        if credentials is None:
+            credentials = service_account.Credentials.from_service_account_info(
+                service_account_info, scopes=[scope])
+            _credentials_cache[key] = credentials
+        return credentials
+
+
+def _ensure_fresh_token(credentials, key):
+    if TOKEN_MANAGER_ENABLED:
+        get_token_manager(credentials, f"{key[0]}|{key[1]}").ensure_token()
+
+
+def _build_service(credentials):
+    http = build_authorized_http(credentials)
+    return build('sheets', 'v4', http=http, cache_discovery=False)
+
+
+class ServicePool:
+    """
+    Checkout/checkin pool of Sheets clients for one (credential identity, scope).
+
+    googleapiclient resources and their http objects are not thread-safe, so a
+    client is only ever used by one thread (or greenlet) at a time. The queue
+    and lock are the stdlib ones, which gevent monkey-patches to cooperative
+    versions, so the same pool works under the gthread and gevent worker classes.
+    """
+
+    def __init__(self, credentials, max_size=CLIENT_POOL_SIZE):
+        self.credentials = credentials
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def checkout(self, timeout=CLIENT_CHECKOUT_TIMEOUT):
+        try:
+            service = self._idle.get_nowait()
+            _record_stat("hits")
+            return service
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                service = _build_service(self.credentials)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            _record_stat("misses")
+            logger.debug(f"Built Google Sheets client {self._created}/{self.max_size}")
+            return service
+        try:
+            service = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"Timed out after {timeout}s waiting for a Google Sheets client")
+        _record_stat("hits")
+        return service
+
+    def checkin(self, service):
+        self._idle.put(service)
+
+    def stats(self):
+        return {"created": self._created, "idle": self._idle.qsize(), "max_size": self.max_size}
+
+
+def _record_stat(name):
+    with _cache_lock:
+        _cache_stats[name] += 1
+
+
+def _get_fresh_credentials(readonly):
+    service_account_info = _get_cached_service_account_info()
+    scope = get_scope(readonly)
+    key = (get_credential_identity(service_account_info), scope)
+    credentials = get_cached_credentials(service_account_info, scope)
+    _ensure_fresh_token(credentials, key)
+    return key, credentials
+
+
+def get_access_credentials(readonly=False):
+    """
+    Cached credentials holding a valid access token, for clients that send
+    their own Authorization header instead of going through googleapiclient
+    """
+    key, credentials = _get_fresh_credentials(readonly)
+    if not credentials.valid:
+        with _refresh_lock:
+            if not credentials.valid:
+                credentials.refresh(google.auth.transport.requests.Request())
+    return credentials
+
+
+def _get_service_pool(readonly):
+    key, credentials = _get_fresh_credentials(readonly)
+    with _cache_lock:
+        pool = _service_cache.get(key)
+        if pool is None or pool.credentials is not credentials:
+            pool = ServicePool(credentials)
+            _service_cache[key] = pool
+    return key, pool
+
+
+@contextmanager
+def sheets_service(readonly=False):
+    _, pool = _get_service_pool(readonly)
+    service = pool.checkout()
+    try:
+        yield service
+    finally:
+        pool.checkin(service)
+
+
+class _ThreadClients:
+    """
+    Clients a thread checked out outside any request. The thread-local holding
+    this is dropped when the thread exits, which returns them to their pools.
+    """
+
+    def __init__(self):
+        self.services = {}
+
+    def __del__(self):
+        for pool, service in self.services.values():
+            pool.checkin(service)
+
+
 def get_google_sheets_service(readonly=False):
-    service_account_info = get_service_account_info()
-    scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly'] if readonly else ['https://www.googleapis.com/auth/spreadsheets']
-    credentials = service_account.Credentials.from_service_account_info(
-        service_account_info, scopes=scopes)
-    http = google_auth_httplib2.AuthorizedHttp(credentials)
-    return build('sheets', 'v4', http=http, cache_discovery=False) 
\ No newline at end of file
+    key, pool = _get_service_pool(readonly)
+    if has_app_context():
+        # One client per request, returned to the pool by release_sheets_services
+        checked_out = g.setdefault('_sheets_services', {})
+        if key not in checked_out:
+            checked_out[key] = (pool, pool.checkout())
+        return checked_out[key][1]
+    # Outside a request the thread keeps a pooled client until it exits.
+    # Background work should prefer sheets_service(), which returns it sooner.
+    clients = getattr(_thread_local, 'clients', None)
+    if clients is None:
+        clients = _thread_local.clients = _ThreadClients()
+    if key not in clients.services or clients.services[key][0] is not pool:
+        clients.services[key] = (pool, pool.checkout())
+    return clients.services[key][1]
+
+
+def release_sheets_services(exception=None):
+    checked_out = g.pop('_sheets_services', None) if has_app_context() else None
+    for pool, service in (checked_out or {}).values():
+        pool.checkin(service)
+
+
+def get_service_cache_stats():
+    with _cache_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "cached_credentials": len(_credentials_cache),
+            "pools": {f"{key[0]}|{key[1]}": pool.stats() for key, pool in _service_cache.items()}
+        }
+
+
+def clear_service_cache():
+    with _cache_lock:
+        _service_account_info_cache.clear()
+        _credentials_cache.clear()
+        _service_cache.clear()
+        _cache_stats["hits"] = 0
+        _cache_stats["misses"] = 0
+
+
+def column_letter(column_number):
+    # 1 -> A, 26 -> Z, 27 -> AA
+    letters = ""
+    while column_number > 0:
+        column_number, remainder = divmod(column_number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def quote_sheet_name(sheet_name):
+    # A1 notation needs the tab name quoted once a cell range follows it
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def column_number(letters):
+    # A -> 1, Z -> 26, AA -> 27
+    number = 0
+    for letter in letters.upper():
+        number = number * 26 + (ord(letter) - 64)
+    return number
+
+
+_A1_RANGE = re.compile(r"^\$?([A-Za-z]*)\$?(\d*)(?::\$?([A-Za-z]*)\$?(\d*))?$")
+
+
+def parse_a1_range(range_str):
+    """
+    Split a sheet-relative A1 range ("A1:D100", "A:D", "B2:F", "5:10") into
+    (start_column, start_row, end_column, end_row); missing parts are None.
+    """
+    match = _A1_RANGE.match((range_str or "").strip())
+    if not match:
+        raise ValueError(f"Unsupported range format: {range_str}")
+    start_col, start_row, end_col, end_row = match.groups()
+    if ':' not in range_str:
+        # A single cell, column or row
+        end_col, end_row = start_col, start_row
+    return (
+        column_number(start_col) if start_col else None,
+        int(start_row) if start_row else None,
+        column_number(end_col) if end_col else None,
+        int(end_row) if end_row else None
+    )
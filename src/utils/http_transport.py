@@ -0,0 +1,129 @@
+import os
+import logging
+
+import httplib2
+import requests
+import google_auth_httplib2
+from google.auth.transport.requests import AuthorizedSession
+
+from src.utils.circuit_breaker import circuit_breaker, BREAKER_ENABLED
+from src.utils.quota_scheduler import quota_scheduler, classify_request, SCHEDULER_ENABLED
+from src.utils.retry import RetryingHttp, RETRY_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# "requests" (pooled keep-alive, default) or "httplib2" (the previous transport)
+HTTP_TRANSPORT = os.environ.get("SHEETS_HTTP_TRANSPORT", "requests").lower()
+POOL_CONNECTIONS = int(os.environ.get("SHEETS_HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("SHEETS_HTTP_POOL_MAXSIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("SHEETS_HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("SHEETS_HTTP_READ_TIMEOUT", "120"))
+
+# requests already decodes these, so they must not be passed back to googleapiclient
+_DROPPED_RESPONSE_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+
+class PooledHttp:
+    """
+    httplib2.Http-compatible adapter over a requests AuthorizedSession.
+
+    googleapiclient only calls `request()` and `close()` on the http object it
+    is built with, so this lets `build()` reuse a keep-alive urllib3 pool
+    instead of opening a fresh httplib2 connection (and TLS handshake) per call.
+    """
+
+    def __init__(self, credentials, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.credentials = credentials
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        response = self.session.request(
+            method, uri, data=body, headers=headers, timeout=self.timeout,
+            allow_redirects=redirections > 0
+        )
+        info = {k.lower(): v for k, v in response.headers.items() if k.lower() not in _DROPPED_RESPONSE_HEADERS}
+        info['status'] = str(response.status_code)
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        self.session.close()
+
+
+class ScheduledHttp:
+    """
+    Waits for the quota scheduler before every Sheets API call, then sends it
+    through the wrapped http object
+    """
+
+    def __init__(self, http, scheduler=quota_scheduler):
+        self.http = http
+        self.scheduler = scheduler
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        self.scheduler.acquire_for_request(uri, method)
+        return self.http.request(
+            uri, method, body=body, headers=headers, redirections=redirections, connection_type=connection_type
+        )
+
+    def close(self):
+        self.http.close()
+
+    def __getattr__(self, name):
+        # googleapiclient looks for e.g. `credentials` on the http object
+        return getattr(self.http, name)
+
+
+class CircuitRecordingHttp:
+    """
+    Reports the final status of each Sheets API call (after retries) to the
+    per-spreadsheet circuit breaker
+    """
+
+    def __init__(self, http, breaker=circuit_breaker):
+        self.http = http
+        self.breaker = breaker
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        response, content = self.http.request(
+            uri, method, body=body, headers=headers, redirections=redirections, connection_type=connection_type
+        )
+        classified = classify_request(uri, method)
+        if classified is not None:
+            self.breaker.record_status(classified[0], response.status)
+        return response, content
+
+    def close(self):
+        self.http.close()
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+def _build_transport(credentials):
+    if HTTP_TRANSPORT == "httplib2":
+        return google_auth_httplib2.AuthorizedHttp(credentials)
+    if HTTP_TRANSPORT != "requests":
+        logger.warning(f"Unknown SHEETS_HTTP_TRANSPORT '{HTTP_TRANSPORT}', using requests")
+    return PooledHttp(credentials)
+
+
+def build_authorized_http(credentials):
+    """
+    breaker -> retry -> quota scheduler -> send; the retry layer waits for
+    quota before each attempt, so ScheduledHttp is only needed when retries
+    are off
+    """
+    http = _build_transport(credentials)
+    scheduler = quota_scheduler if SCHEDULER_ENABLED else None
+    if RETRY_ENABLED:
+        http = RetryingHttp(http, scheduler)
+    elif scheduler is not None:
+        http = ScheduledHttp(http, scheduler)
+    if BREAKER_ENABLED:
+        http = CircuitRecordingHttp(http)
+    return http
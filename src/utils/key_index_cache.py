@@ -0,0 +1,171 @@
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from src.utils.local_store import connect
+
+logger = logging.getLogger(__name__)
+
+KEY_INDEX_CACHE_SIZE = int(os.environ.get("SHEETS_KEY_INDEX_CACHE_SIZE", "128"))
+# Upper bound on how long an index is trusted without re-reading the key column,
+# which is what catches edits made outside the connector
+KEY_INDEX_TTL_SECONDS = float(os.environ.get("SHEETS_KEY_INDEX_TTL", "30"))
+GENERATIONS_DB = "write_generations.db"
+
+_UPDATED_RANGE_START = re.compile(r"!\$?[A-Za-z]*\$?(\d+)")
+
+
+def parse_updated_range_start_row(updated_range):
+    match = _UPDATED_RANGE_START.search(updated_range or "")
+    return int(match.group(1)) if match else None
+
+
+class WriteGenerations:
+    """
+    Per-spreadsheet write counter shared by every worker process on the host
+    through SQLite. Every write path bumps it, so an index cached in one
+    worker can tell that another worker has written since it was read.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = connect(GENERATIONS_DB)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations (spreadsheet_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def current(self, spreadsheet_id):
+        """
+        The spreadsheet's generation, or None when the store is unavailable
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT generation FROM generations WHERE spreadsheet_id = ?", (spreadsheet_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Write generation store unavailable: {e}")
+            return None
+        return row[0] if row else 0
+
+    def bump(self, spreadsheet_id):
+        """
+        Record a write and return the new generation, or None when the store is unavailable
+        """
+        try:
+            conn = self._connection()
+            with conn:
+                row = conn.execute(
+                    "INSERT INTO generations (spreadsheet_id, generation) VALUES (?, 1) "
+                    "ON CONFLICT (spreadsheet_id) DO UPDATE SET generation = generation + 1 "
+                    "RETURNING generation",
+                    (spreadsheet_id,)
+                ).fetchone()
+            return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Write generation store unavailable: {e}")
+            return None
+
+
+write_generations = WriteGenerations()
+
+
+class KeyIndex:
+    def __init__(self, headers, key_column, key_to_row, last_row, generation=None):
+        self.headers = headers
+        self.key_column = key_column
+        self.key_idx = headers.index(key_column)
+        self.key_to_row = key_to_row
+        self.last_row = last_row
+        # Write generation of the spreadsheet when the key column was read
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+
+
+class KeyIndexCache:
+    """
+    LRU of key -> row indexes per (spreadsheet_id, sheet_name, key_column).
+
+    Entries expire after `ttl` seconds and are kept current between reads by
+    apply_append(). An append that does not land directly after the last known
+    row means the sheet changed underneath us, so the entry is dropped. An
+    entry is also dropped once the spreadsheet's shared write generation has
+    moved past the one it was read at, i.e. any worker has written since.
+    """
+
+    def __init__(self, max_size=KEY_INDEX_CACHE_SIZE, ttl=KEY_INDEX_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, cache_key):
+        generation = write_generations.current(cache_key[0])
+        with self._lock:
+            index = self._entries.get(cache_key)
+            if index is not None and (time.monotonic() - index.loaded_at > self.ttl
+                                      or generation is None or index.generation != generation):
+                del self._entries[cache_key]
+                index = None
+            if index is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.stats["hits"] += 1
+            return index
+
+    def put(self, cache_key, index):
+        with self._lock:
+            self._entries[cache_key] = index
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, cache_key):
+        with self._lock:
+            if self._entries.pop(cache_key, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def invalidate_spreadsheet(self, spreadsheet_id):
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == spreadsheet_id]:
+                del self._entries[cache_key]
+                self.stats["invalidations"] += 1
+
+    def apply_append(self, cache_key, index, updated_range, appended_rows):
+        """
+        Add appended rows to the index; False when the append shows it is stale
+        """
+        start_row = parse_updated_range_start_row(updated_range)
+        if start_row is None or start_row != index.last_row + 1:
+            logger.info(f"Key index for {cache_key} is stale (append landed at row {start_row}, expected {index.last_row + 1})")
+            self.invalidate(cache_key)
+            return False
+        with self._lock:
+            for offset, row in enumerate(appended_rows):
+                if len(row) > index.key_idx:
+                    key_val = str(row[index.key_idx]).strip()
+                    if key_val and key_val != index.key_column:
+                        index.key_to_row[key_val] = start_row + offset
+            index.last_row = start_row + len(appended_rows) - 1
+        return True
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+
+key_index_cache = KeyIndexCache()
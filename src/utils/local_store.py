@@ -0,0 +1,22 @@
+import os
+import sqlite3
+
+# Local state that has to outlive a request or be shared by gunicorn workers
+# on the same host (change-tracking snapshots, replicas, job state)
+DATA_DIR = os.environ.get("SHEETS_DATA_DIR", "/tmp/google_sheets_connector")
+
+
+def get_data_path(name):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+def connect(name):
+    """
+    Open a connection to a SQLite database in DATA_DIR. Connections are cheap
+    and not shared between threads; WAL lets other workers read while one writes.
+    """
+    conn = sqlite3.connect(get_data_path(name), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
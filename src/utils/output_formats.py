@@ -0,0 +1,77 @@
+import io
+import csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+OUTPUT_FORMATS = ["rows", "csv", "columnar", "arrow"]
+# Formats that can be produced row by row from the streaming read
+STREAMABLE_FORMATS = ["rows", "csv"]
+VALUE_RENDER_OPTIONS = ["FORMATTED_VALUE", "UNFORMATTED_VALUE", "FORMULA"]
+
+CSV_MIMETYPE = "text/csv"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def iter_csv(rows):
+    """
+    Encode rows as CSV one line at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _unique_headers(header):
+    # Columnar output is keyed by header, so blanks and duplicates need names
+    seen = {}
+    names = []
+    for index, name in enumerate(header):
+        name = str(name) if name not in (None, "") else f"column_{index + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        names.append(name)
+    return names
+
+
+def to_columnar(header, rows):
+    """
+    {header: [value per row]}. Short rows are padded with None; cells beyond
+    the header row have no name to go under and are dropped.
+    """
+    names = _unique_headers(header)
+    columns = {name: [] for name in names}
+    for row in rows:
+        for index, name in enumerate(names):
+            columns[name].append(row[index] if index < len(row) else None)
+    return columns
+
+
+def _arrow_array(values):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types in one column (e.g. numbers and "N/A"): fall back to text
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def to_arrow_ipc(header, rows):
+    if pa is None:
+        raise ValueError("Arrow output requires the optional 'pyarrow' package")
+    columns = to_columnar(header, rows)
+    table = pa.table({name: _arrow_array(values) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
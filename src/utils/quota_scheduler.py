@@ -0,0 +1,223 @@
+import os
+import asyncio
+import re
+import time
+import logging
+import sqlite3
+import threading
+
+from src.utils.local_store import connect
+
+logger = logging.getLogger(__name__)
+
+QUOTA_DB = "quota.db"
+# Opt-in: every worker on the host shares these buckets, so set the limits
+# to the Google Cloud project's actual Sheets quota before enabling it
+SCHEDULER_ENABLED = os.environ.get("SHEETS_QUOTA_SCHEDULER_ENABLED", "false").lower() == "true"
+# Sheets API defaults per minute for the whole project
+PROJECT_READS_PER_MINUTE = float(os.environ.get("SHEETS_QUOTA_PROJECT_READS_PER_MINUTE", "300"))
+PROJECT_WRITES_PER_MINUTE = float(os.environ.get("SHEETS_QUOTA_PROJECT_WRITES_PER_MINUTE", "300"))
+# Keeps one busy spreadsheet from using the whole project budget; the
+# per-user-per-project default
+SPREADSHEET_READS_PER_MINUTE = float(os.environ.get("SHEETS_QUOTA_SPREADSHEET_READS_PER_MINUTE", "60"))
+SPREADSHEET_WRITES_PER_MINUTE = float(os.environ.get("SHEETS_QUOTA_SPREADSHEET_WRITES_PER_MINUTE", "60"))
+# Fraction of each limit actually used, so throughput settles just under quota
+QUOTA_HEADROOM = float(os.environ.get("SHEETS_QUOTA_HEADROOM", "0.9"))
+# Bucket capacity in seconds of refill; small so a burst cannot overrun a minute window
+BURST_SECONDS = float(os.environ.get("SHEETS_QUOTA_BURST_SECONDS", "5"))
+# How long a call may queue for quota before failing
+MAX_WAIT_SECONDS = float(os.environ.get("SHEETS_QUOTA_MAX_WAIT", "60"))
+
+_SPREADSHEET_ID = re.compile(r'/v4/spreadsheets/([^/:?]+)')
+# POST endpoints that only read
+_READ_SUFFIXES = (':getByDataFilter', ':batchGetByDataFilter')
+
+
+class QuotaWaitTimeout(RuntimeError):
+    pass
+
+
+def classify_request(uri, method):
+    """
+    (spreadsheet_id, "read" | "write") for a Sheets API call, None for anything else
+    """
+    match = _SPREADSHEET_ID.search(uri or "")
+    if not match:
+        return None
+    path = uri.split('?', 1)[0]
+    if method.upper() == "GET" or path.endswith(_READ_SUFFIXES):
+        return match.group(1), "read"
+    return match.group(1), "write"
+
+
+class QuotaScheduler:
+    """
+    Token buckets shared by every worker process on the host through SQLite.
+
+    Each call takes one token from the project bucket and one from its
+    spreadsheet's bucket for the same kind (read or write). When either is
+    empty the caller sleeps until both have refilled, up to its deadline.
+    """
+
+    def __init__(self, limits=None, headroom=QUOTA_HEADROOM, burst_seconds=BURST_SECONDS,
+                 max_wait=MAX_WAIT_SECONDS):
+        self.limits = limits or {
+            ("project", "read"): PROJECT_READS_PER_MINUTE,
+            ("project", "write"): PROJECT_WRITES_PER_MINUTE,
+            ("spreadsheet", "read"): SPREADSHEET_READS_PER_MINUTE,
+            ("spreadsheet", "write"): SPREADSHEET_WRITES_PER_MINUTE
+        }
+        self.headroom = headroom
+        self.burst_seconds = burst_seconds
+        self.max_wait = max_wait
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "delayed": 0, "wait_seconds": 0.0, "timeouts": 0}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = connect(QUOTA_DB)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _buckets(self, spreadsheet_id, kind):
+        buckets = []
+        for scope, name in (("project", f"project:{kind}"), ("spreadsheet", f"{spreadsheet_id}:{kind}")):
+            per_minute = self.limits.get((scope, kind))
+            if per_minute and per_minute > 0:
+                rate = per_minute * self.headroom / 60.0
+                buckets.append((name, rate, max(1.0, rate * self.burst_seconds)))
+        return buckets
+
+    def _try_take(self, buckets):
+        """
+        Take a token from every bucket, or none. Returns seconds to wait (0 when taken).
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            wait = 0.0
+            for name, rate, capacity in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                levels.append((name, tokens))
+                if tokens < 1.0:
+                    wait = max(wait, (1.0 - tokens) / rate)
+            if wait == 0.0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(name, tokens - 1.0, now) for name, tokens in levels]
+                )
+            conn.commit()
+            return wait
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _take_or_wait(self, buckets):
+        try:
+            return self._try_take(buckets)
+        except sqlite3.Error as e:
+            # Never block Sheets calls on the local store itself
+            logger.error(f"Quota store unavailable, sending unthrottled: {e}")
+            return 0.0
+
+    def _check_deadline(self, spreadsheet_id, kind, wait, started, deadline):
+        if time.time() + wait > deadline:
+            with self._stats_lock:
+                self.stats["timeouts"] += 1
+            raise QuotaWaitTimeout(
+                f"Sheets API {kind} quota for spreadsheet {spreadsheet_id} not available "
+                f"within {round(deadline - started, 1)}s"
+            )
+
+    def _record_acquired(self, started):
+        waited = time.time() - started
+        with self._stats_lock:
+            self.stats["calls"] += 1
+            if waited > 0.01:
+                self.stats["delayed"] += 1
+                self.stats["wait_seconds"] += waited
+        return waited
+
+    def acquire(self, spreadsheet_id, kind, deadline=None):
+        """
+        Block until the call may be sent. deadline is an absolute time.time().
+        """
+        buckets = self._buckets(spreadsheet_id, kind)
+        if not buckets:
+            return 0.0
+        deadline = deadline if deadline is not None else time.time() + self.max_wait
+        started = time.time()
+        while True:
+            wait = self._take_or_wait(buckets)
+            if wait == 0.0:
+                break
+            self._check_deadline(spreadsheet_id, kind, wait, started, deadline)
+            time.sleep(wait)
+        return self._record_acquired(started)
+
+    async def acquire_async(self, spreadsheet_id, kind, deadline=None):
+        """
+        acquire() for coroutines: the SQLite transaction runs on the loop's
+        default executor and the wait is an asyncio sleep, so queued calls
+        do not hold a thread each
+        """
+        buckets = self._buckets(spreadsheet_id, kind)
+        if not buckets:
+            return 0.0
+        deadline = deadline if deadline is not None else time.time() + self.max_wait
+        started = time.time()
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = await loop.run_in_executor(None, self._take_or_wait, buckets)
+            if wait == 0.0:
+                break
+            self._check_deadline(spreadsheet_id, kind, wait, started, deadline)
+            await asyncio.sleep(wait)
+        return self._record_acquired(started)
+
+    def burst_size(self, kind):
+        """
+        Calls of `kind` the project bucket admits back to back, None when unthrottled
+        """
+        if not SCHEDULER_ENABLED:
+            return None
+        per_minute = self.limits.get(("project", kind))
+        if not per_minute or per_minute <= 0:
+            return None
+        return max(1, int(per_minute * self.headroom / 60.0 * self.burst_seconds))
+
+    def acquire_for_request(self, uri, method, deadline=None):
+        classified = classify_request(uri, method)
+        if classified is None:
+            return 0.0
+        return self.acquire(classified[0], classified[1], deadline)
+
+    async def acquire_for_request_async(self, uri, method, deadline=None):
+        classified = classify_request(uri, method)
+        if classified is None:
+            return 0.0
+        return await self.acquire_async(classified[0], classified[1], deadline)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["enabled"] = SCHEDULER_ENABLED
+        return stats
+
+
+quota_scheduler = QuotaScheduler()
+
+
+def get_quota_stats():
+    return quota_scheduler.get_stats()
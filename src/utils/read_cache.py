@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 0 keeps nothing between requests but still collapses concurrent identical reads
+READ_CACHE_TTL_SECONDS = float(os.environ.get("SHEETS_READ_CACHE_TTL", "0"))
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("SHEETS_READ_CACHE_MAX_ENTRIES", "256"))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReadCache:
+    """
+    Read-through TTL cache with LRU eviction and single-flight de-duplication.
+
+    Keys are tuples whose first element is the spreadsheet_id, so every entry
+    for a spreadsheet can be dropped when the connector writes to it. A write
+    also detaches reads already in flight for the spreadsheet, so a read that
+    starts after the write never joins a fetch that began before it. Cached
+    values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, ttl=READ_CACHE_TTL_SECONDS, max_entries=READ_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    def get_or_fetch(self, key, fetch, ttl=None):
+        """
+        Return (value, status) where status is "hit", "coalesced" or "miss"
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value, "hit"
+                del self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                generation = self._generations.get(key[0], 0)
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, "coalesced"
+        try:
+            flight.value = fetch()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # A write may have detached this flight and a newer one taken its place
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                # Skip storing if a write invalidated the spreadsheet mid-fetch
+                if flight.error is None and ttl > 0 and self._generations.get(key[0], 0) == generation:
+                    self._entries[key] = (time.monotonic() + ttl, flight.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+            flight.done.set()
+        return flight.value, "miss"
+
+    def invalidate_spreadsheet(self, spreadsheet_id):
+        with self._lock:
+            self._generations[spreadsheet_id] = self._generations.get(spreadsheet_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == spreadsheet_id]:
+                del self._entries[key]
+                self.stats["invalidations"] += 1
+            # Callers already waiting keep their result; later ones fetch afresh
+            for key in [k for k in self._inflight if k[0] == spreadsheet_id]:
+                del self._inflight[key]
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            saved = self.stats["hits"] + self.stats["coalesced"]
+            return dict(
+                self.stats,
+                size=len(self._entries),
+                saved_api_calls=saved,
+                hit_ratio=round(saved / lookups, 4) if lookups else 0.0
+            )
+
+
+read_cache = ReadCache()
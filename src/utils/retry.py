@@ -0,0 +1,244 @@
+import os
+import time
+import socket
+import random
+import logging
+import threading
+import email.utils
+
+import httplib2
+import requests
+import urllib3
+from googleapiclient.errors import HttpError
+from google.auth.exceptions import RefreshError, TransportError
+
+from src.utils.quota_scheduler import QuotaWaitTimeout
+
+logger = logging.getLogger(__name__)
+
+RETRY_ENABLED = os.environ.get("SHEETS_RETRY_ENABLED", "true").lower() == "true"
+MAX_ATTEMPTS = int(os.environ.get("SHEETS_RETRY_MAX_ATTEMPTS", "5"))
+BASE_DELAY_SECONDS = float(os.environ.get("SHEETS_RETRY_BASE_DELAY", "0.5"))
+MAX_DELAY_SECONDS = float(os.environ.get("SHEETS_RETRY_MAX_DELAY", "32"))
+# Total time one API call may spend across attempts, backoff and quota waits
+DEADLINE_SECONDS = float(os.environ.get("SHEETS_RETRY_DEADLINE", "90"))
+
+RATE_LIMITED = "rate_limited"
+SERVER_ERROR = "server_error"
+TIMEOUT = "timeout"
+NETWORK = "network"
+# Failed before any bytes reached Google, so the call was certainly not applied
+CONNECT_FAILED = "connect_failed"
+PERMISSION = "permission"
+NOT_FOUND = "not_found"
+BAD_REQUEST = "bad_request"
+AUTH = "auth"
+UNKNOWN = "unknown"
+
+ERROR_DESCRIPTIONS = {
+    RATE_LIMITED: "API quota/rate limit exceeded",
+    SERVER_ERROR: "Google Sheets API server error",
+    TIMEOUT: "Request timed out",
+    NETWORK: "Network connectivity issue",
+    CONNECT_FAILED: "Could not connect to the Google Sheets API",
+    PERMISSION: "Spreadsheet permission issue",
+    NOT_FOUND: "Spreadsheet or sheet not found",
+    BAD_REQUEST: "Invalid request (e.g. range format)",
+    AUTH: "Invalid service account credentials",
+    UNKNOWN: "Unknown error"
+}
+
+_STATUS_CLASSES = {
+    400: BAD_REQUEST,
+    401: AUTH,
+    403: PERMISSION,
+    404: NOT_FOUND,
+    408: TIMEOUT,
+    429: RATE_LIMITED,
+    500: SERVER_ERROR,
+    502: SERVER_ERROR,
+    503: SERVER_ERROR,
+    504: SERVER_ERROR
+}
+_RETRYABLE_CLASSES = (RATE_LIMITED, SERVER_ERROR, TIMEOUT, NETWORK, CONNECT_FAILED)
+# Classes where Google has certainly not applied the request
+_NOT_APPLIED_CLASSES = (RATE_LIMITED, CONNECT_FAILED)
+# Classes where a write may or may not have been applied
+_AMBIGUOUS_CLASSES = (SERVER_ERROR, TIMEOUT, NETWORK, UNKNOWN)
+# POST endpoints that are safe to repeat: they read, or set cells to fixed values
+_IDEMPOTENT_POST_SUFFIXES = (
+    '/values:batchGetByDataFilter', '/values:batchUpdate', '/values:batchUpdateByDataFilter',
+    '/values:batchClear', '/values:batchClearByDataFilter', ':clear', ':getByDataFilter'
+)
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "retries": 0, "recovered": 0, "gave_up": 0, "errors": {}}
+
+
+def classify_status(status):
+    status = int(status)
+    if status in _STATUS_CLASSES:
+        return _STATUS_CLASSES[status]
+    if status >= 500:
+        return SERVER_ERROR
+    return UNKNOWN
+
+
+def _connect_failed(error):
+    if isinstance(error, (requests.exceptions.ConnectTimeout, httplib2.ServerNotFoundError,
+                          ConnectionRefusedError, socket.gaierror)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, urllib3.exceptions.NewConnectionError)
+    return False
+
+
+def classify_exception(error):
+    """
+    Error class for anything raised while calling the Sheets API
+    """
+    if isinstance(error, HttpError):
+        return classify_status(error.resp.status)
+    if isinstance(error, QuotaWaitTimeout):
+        return RATE_LIMITED
+    if isinstance(error, RefreshError):
+        return AUTH
+    if _connect_failed(error):
+        return CONNECT_FAILED
+    if isinstance(error, (requests.exceptions.Timeout, socket.timeout, TimeoutError)):
+        return TIMEOUT
+    if isinstance(error, (requests.exceptions.ConnectionError, TransportError, httplib2.HttpLib2Error, OSError)):
+        return NETWORK
+    return UNKNOWN
+
+
+def describe_error(error):
+    return ERROR_DESCRIPTIONS[classify_exception(error)]
+
+
+def is_idempotent(uri, method):
+    method = method.upper()
+    if method in ("GET", "PUT", "DELETE"):
+        return True
+    path = uri.split('?', 1)[0]
+    return method == "POST" and path.endswith(_IDEMPOTENT_POST_SUFFIXES)
+
+
+def may_have_been_applied(error_class):
+    """
+    True when a failed write may still have been applied by Google, so
+    repeating it could write twice
+    """
+    return error_class in _AMBIGUOUS_CLASSES
+
+
+def should_retry(error_class, idempotent):
+    if error_class in _NOT_APPLIED_CLASSES:
+        return True
+    return idempotent and error_class in _RETRYABLE_CLASSES
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Full-jitter exponential backoff, never shorter than the server's Retry-After
+    """
+    delay = random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def record_retry_stat(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def record_error_class(error_class):
+    with _stats_lock:
+        _stats["errors"][error_class] = _stats["errors"].get(error_class, 0) + 1
+
+
+def get_retry_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+        stats["errors"] = dict(_stats["errors"])
+    return stats
+
+
+class RetryingHttp:
+    """
+    Retries Sheets API calls on transient failures, then quota scheduling,
+    then the real send: retry -> scheduler -> send.
+
+    Non-idempotent calls (values.append, spreadsheets.batchUpdate) are only
+    retried when the request certainly was not applied (429, connect
+    failure), so a retry can never apply a write twice.
+    """
+
+    def __init__(self, http, scheduler=None, max_attempts=MAX_ATTEMPTS, deadline_seconds=DEADLINE_SECONDS):
+        self.http = http
+        self.scheduler = scheduler
+        self.max_attempts = max_attempts
+        self.deadline_seconds = deadline_seconds
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        deadline = time.time() + self.deadline_seconds
+        idempotent = is_idempotent(uri, method)
+        record_retry_stat("calls")
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                self.scheduler.acquire_for_request(uri, method, deadline)
+            error = None
+            retry_after = None
+            try:
+                response, content = self.http.request(
+                    uri, method, body=body, headers=headers, redirections=redirections,
+                    connection_type=connection_type
+                )
+            except Exception as e:
+                error = e
+                error_class = classify_exception(e)
+            else:
+                if response.status < 400:
+                    if attempt:
+                        record_retry_stat("recovered")
+                    return response, content
+                error_class = classify_status(response.status)
+                retry_after = parse_retry_after(response.get('retry-after'))
+            record_error_class(error_class)
+            attempt += 1
+            delay = backoff_delay(attempt - 1, retry_after)
+            if (not should_retry(error_class, idempotent) or attempt >= self.max_attempts
+                    or time.time() + delay > deadline):
+                if should_retry(error_class, idempotent):
+                    record_retry_stat("gave_up")
+                if error is not None:
+                    raise error
+                return response, content
+            record_retry_stat("retries")
+            logger.warning(
+                f"Retrying {method} {uri.split('?', 1)[0]} after {error_class} "
+                f"(attempt {attempt + 1}/{self.max_attempts}) in {round(delay, 2)}s"
+            )
+            time.sleep(delay)
+
+    def close(self):
+        self.http.close()
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
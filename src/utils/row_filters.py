@@ -0,0 +1,123 @@
+import json
+
+NUMERIC_OPERATORS = {
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b
+}
+OPERATORS = {"eq", "ne", "in", "not_in", "empty", "not_empty"} | set(NUMERIC_OPERATORS)
+
+
+def _load_json_list(raw, name):
+    if raw in (None, "", []):
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError:
+            raise ValueError(f"{name} must be a JSON array")
+    if not isinstance(raw, list):
+        raise ValueError(f"{name} must be an array")
+    return raw
+
+
+def parse_columns(columns_raw):
+    """
+    Column projection by header name: a JSON array or a comma-separated string
+    """
+    if isinstance(columns_raw, str) and columns_raw.strip() and not columns_raw.strip().startswith('['):
+        return [column.strip() for column in columns_raw.split(',') if column.strip()]
+    columns = _load_json_list(columns_raw, "columns")
+    if not all(isinstance(column, str) for column in columns):
+        raise ValueError("columns must be header names")
+    return columns
+
+
+def parse_filters(filters_raw):
+    """
+    Row predicates: [{"column": "Status", "op": "eq", "value": "Open"}, ...]
+    All predicates must match for a row to be kept.
+    """
+    filters = _load_json_list(filters_raw, "filters")
+    for row_filter in filters:
+        if not isinstance(row_filter, dict) or not row_filter.get("column"):
+            raise ValueError(f"Invalid filter: {row_filter}")
+        op = row_filter.get("op", "eq")
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported filter op '{op}'. Must be one of: {', '.join(sorted(OPERATORS))}")
+        if op in ("in", "not_in") and not isinstance(row_filter.get("value"), list):
+            raise ValueError(f"Filter op '{op}' needs a list value")
+        if op in NUMERIC_OPERATORS:
+            try:
+                float(row_filter.get("value"))
+            except (TypeError, ValueError):
+                raise ValueError(f"Filter op '{op}' needs a numeric value")
+    return filters
+
+
+def _to_number(value):
+    try:
+        return float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+def _compile_predicate(index, op, value):
+    def cell(row):
+        return row[index] if index < len(row) else ""
+
+    if op == "eq":
+        expected = str(value)
+        return lambda row: str(cell(row)) == expected
+    if op == "ne":
+        expected = str(value)
+        return lambda row: str(cell(row)) != expected
+    if op in ("in", "not_in"):
+        allowed = {str(item) for item in value}
+        if op == "in":
+            return lambda row: str(cell(row)) in allowed
+        return lambda row: str(cell(row)) not in allowed
+    if op == "empty":
+        return lambda row: str(cell(row)).strip() == ""
+    if op == "not_empty":
+        return lambda row: str(cell(row)).strip() != ""
+    compare = NUMERIC_OPERATORS[op]
+    threshold = float(value)
+
+    def numeric(row):
+        number = _to_number(cell(row))
+        return number is not None and compare(number, threshold)
+    return numeric
+
+
+class RowSelector:
+    """
+    Projection and filters resolved against a header row once, then applied
+    lazily to any iterable of rows.
+    """
+
+    def __init__(self, headers, columns=None, filters=None):
+        header_index = {}
+        for index, header in enumerate(headers):
+            header_index.setdefault(header, index)
+        missing = [name for name in (columns or []) + [f["column"] for f in (filters or [])] if name not in header_index]
+        if missing:
+            raise ValueError(f"Columns not found in sheet headers: {missing}")
+        self.headers = list(columns) if columns else list(headers)
+        self.indexes = [header_index[name] for name in columns] if columns else None
+        self.predicates = [
+            _compile_predicate(header_index[f["column"]], f.get("op", "eq"), f.get("value"))
+            for f in (filters or [])
+        ]
+
+    def project(self, row):
+        if self.indexes is None:
+            return row
+        return [row[index] if index < len(row) else "" for index in self.indexes]
+
+    def select(self, rows):
+        predicates = self.predicates
+        for row in rows:
+            if all(predicate(row) for predicate in predicates):
+                yield self.project(row)
@@ -0,0 +1,121 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_row_numbers(row_numbers_str):
+    """
+    Parse row numbers string into sorted, merged (start, end) row intervals.
+    Supports formats like: "5", "5-10", "5,7,10-12"
+    Ranges are never expanded, so "2-500000" costs the same as "2".
+    """
+    try:
+        if not row_numbers_str or not row_numbers_str.strip():
+            raise ValueError("Row numbers string is empty")
+        intervals = []
+        parts = row_numbers_str.strip().split(',')
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                try:
+                    start, end = part.split('-', 1)
+                    start_row = int(start.strip())
+                    end_row = int(end.strip())
+                    if start_row > end_row:
+                        raise ValueError(f"Invalid range: {part} (start > end)")
+                    if start_row < 1:
+                        raise ValueError(f"Invalid row number: {start_row} (must be >= 1)")
+                    intervals.append((start_row, end_row))
+                except ValueError as e:
+                    raise ValueError(f"Invalid range format: {part}. Use format like '5-10'")
+            else:
+                try:
+                    row_num = int(part)
+                    if row_num < 1:
+                        raise ValueError(f"Invalid row number: {row_num} (must be >= 1)")
+                    intervals.append((row_num, row_num))
+                except ValueError as e:
+                    raise ValueError(f"Invalid row number: {part}. Must be a valid integer")
+        intervals = merge_row_intervals(intervals)
+        if not intervals:
+            raise ValueError("No valid row numbers found")
+        return intervals
+    except Exception as e:
+        logger.error(f"Error parsing row numbers: {e}")
+        raise
+
+
+def merge_row_intervals(intervals):
+    """
+    Sort inclusive (start, end) intervals and merge overlapping or adjacent ones
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def count_rows(intervals):
+    return sum(end - start + 1 for start, end in intervals)
+
+
+def subtract_intervals(intervals, removed):
+    """
+    Parts of `intervals` not covered by `removed`; both sorted and merged
+    """
+    result = []
+    for start, end in intervals:
+        for removed_start, removed_end in removed:
+            if removed_end < start or removed_start > end:
+                continue
+            if removed_start > start:
+                result.append((start, removed_start - 1))
+            start = removed_end + 1
+            if start > end:
+                break
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+class RowShift:
+    """
+    Maps row numbers of a tab as it was before a sequence of row deletes to
+    row numbers after them, so every operation in a batch can address rows
+    the way the caller saw the sheet.
+    """
+
+    def __init__(self):
+        self.deleted = []
+
+    def overlaps_deleted(self, start_row, end_row):
+        return any(start <= end_row and end >= start_row for start, end in self.deleted)
+
+    def current_row(self, row):
+        """
+        Row number after the deletes so far, None if the row itself was deleted
+        """
+        shift = 0
+        for start, end in self.deleted:
+            if start > row:
+                break
+            if end >= row:
+                return None
+            shift += end - start + 1
+        return row - shift
+
+    def delete(self, intervals):
+        """
+        Record a delete of original-numbered intervals. Returns the current
+        (start, end) intervals to delete, bottom-up; rows already deleted
+        earlier are skipped.
+        """
+        remaining = subtract_intervals(merge_row_intervals(intervals), self.deleted)
+        current = [(self.current_row(start), self.current_row(start) + end - start) for start, end in remaining]
+        self.deleted = merge_row_intervals(self.deleted + remaining)
+        return sorted(current, reverse=True)
@@ -0,0 +1,143 @@
+import os
+import time
+import logging
+import threading
+
+from src.utils.google_sheets import quote_sheet_name
+from src.utils.key_index_cache import write_generations
+
+logger = logging.getLogger(__name__)
+
+METADATA_TTL_SECONDS = float(os.environ.get("SHEETS_METADATA_TTL", "300"))
+# Header rows decide which column each value is written to, so they are
+# trusted for much less time; this bounds edits made outside the connector
+HEADERS_TTL_SECONDS = float(os.environ.get("SHEETS_HEADERS_TTL", "10"))
+# Only tab properties; never grid data, named ranges, formatting etc.
+METADATA_FIELDS = 'sheets(properties(sheetId,title,index,gridProperties(rowCount,columnCount)))'
+
+
+class SpreadsheetMetadata:
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.headers = {}
+        self.loaded_at = time.monotonic()
+
+    def titles(self):
+        return [title for title, _ in sorted(self.sheets.items(), key=lambda item: item[1]["index"])]
+
+
+class SheetMetadataCache:
+    """
+    Per-spreadsheet cache of tab titles, sheetIds, grid sizes and header rows.
+
+    Entries are refreshed after `ttl` seconds, when a tab is looked up that the
+    cached copy does not know about, or when a caller reports a structural
+    change or error through invalidate().
+
+    Header rows expire after `headers_ttl` seconds, or as soon as any worker
+    has written to the spreadsheet (its shared write generation moved). An
+    empty header row is never cached, since the next write may add one.
+    """
+
+    def __init__(self, ttl=METADATA_TTL_SECONDS, headers_ttl=HEADERS_TTL_SECONDS):
+        self.ttl = ttl
+        self.headers_ttl = headers_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "header_hits": 0, "header_misses": 0}
+
+    def _fetch(self, service, spreadsheet_id):
+        result = service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields=METADATA_FIELDS
+        ).execute()
+        sheets = {}
+        for sheet in result.get('sheets', []):
+            properties = sheet.get('properties', {})
+            grid = properties.get('gridProperties', {})
+            sheets[properties.get('title', '')] = {
+                "sheet_id": properties.get('sheetId'),
+                "index": properties.get('index', 0),
+                "row_count": grid.get('rowCount', 0),
+                "column_count": grid.get('columnCount', 0)
+            }
+        return SpreadsheetMetadata(sheets)
+
+    def get(self, service, spreadsheet_id, force_refresh=False):
+        with self._lock:
+            metadata = self._entries.get(spreadsheet_id)
+            if metadata is not None and not force_refresh and time.monotonic() - metadata.loaded_at <= self.ttl:
+                self.stats["hits"] += 1
+                return metadata
+            self.stats["misses"] += 1
+        metadata = self._fetch(service, spreadsheet_id)
+        with self._lock:
+            self._entries[spreadsheet_id] = metadata
+        return metadata
+
+    def get_sheet_titles(self, service, spreadsheet_id):
+        return self.get(service, spreadsheet_id).titles()
+
+    def get_sheet_properties(self, service, spreadsheet_id, sheet_name, force_refresh=False):
+        metadata = self.get(service, spreadsheet_id, force_refresh=force_refresh)
+        if sheet_name not in metadata.sheets and not force_refresh:
+            # The tab may have been added or renamed since we cached the list
+            metadata = self.get(service, spreadsheet_id, force_refresh=True)
+        if sheet_name not in metadata.sheets:
+            raise ValueError(f"Sheet '{sheet_name}' not found in spreadsheet")
+        return metadata.sheets[sheet_name]
+
+    def get_sheet_id(self, service, spreadsheet_id, sheet_name):
+        return self.get_sheet_properties(service, spreadsheet_id, sheet_name)["sheet_id"]
+
+    def get_headers(self, service, spreadsheet_id, sheet_name):
+        # Read before the header row, so a write racing the read leaves it stale
+        generation = write_generations.current(spreadsheet_id)
+        metadata = self.get(service, spreadsheet_id)
+        with self._lock:
+            cached = metadata.headers.get(sheet_name)
+            if cached is not None:
+                headers, loaded_at, cached_generation = cached
+                if (generation is not None and cached_generation == generation
+                        and time.monotonic() - loaded_at <= self.headers_ttl):
+                    self.stats["header_hits"] += 1
+                    return headers
+                metadata.headers.pop(sheet_name, None)
+            self.stats["header_misses"] += 1
+        result = service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{quote_sheet_name(sheet_name)}!1:1",
+            fields='values'
+        ).execute()
+        values = result.get('values', [])
+        headers = values[0] if values else []
+        if headers and generation is not None:
+            with self._lock:
+                metadata.headers[sheet_name] = (headers, time.monotonic(), generation)
+        return headers
+
+    def note_rows_deleted(self, spreadsheet_id, sheet_name, row_count):
+        with self._lock:
+            metadata = self._entries.get(spreadsheet_id)
+            if metadata is not None and sheet_name in metadata.sheets:
+                sheet = metadata.sheets[sheet_name]
+                sheet["row_count"] = max(sheet["row_count"] - row_count, 0)
+                # Deleting row 1 would change the headers
+                metadata.headers.pop(sheet_name, None)
+
+    def invalidate_headers(self, spreadsheet_id):
+        with self._lock:
+            metadata = self._entries.get(spreadsheet_id)
+            if metadata is not None:
+                metadata.headers.clear()
+
+    def invalidate(self, spreadsheet_id):
+        with self._lock:
+            self._entries.pop(spreadsheet_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+
+metadata_cache = SheetMetadataCache()
@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from src.utils.google_sheets import sheets_service
+from src.utils.local_store import connect, get_data_path
+from src.utils.output_formats import _unique_headers
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB = "replica.db"
+REPLICA_MAX_ROWS = int(os.environ.get("SHEETS_REPLICA_MAX_ROWS", "10000"))
+# How often the background thread looks for replicas that are due or stale
+SCHEDULER_INTERVAL_SECONDS = float(os.environ.get("SHEETS_REPLICA_SCHEDULER_INTERVAL", "5"))
+# A worker holds the refresh lease this long so others do not refresh the same sheet
+REFRESH_LEASE_SECONDS = 300
+QUERY_TABLE = "sheet"
+
+_scheduler_lock = threading.Lock()
+_scheduler = {"thread": None, "pid": None}
+
+
+def _init(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS replicas ("
+        "name TEXT PRIMARY KEY, spreadsheet_id TEXT NOT NULL, sheet_name TEXT NOT NULL, "
+        "table_name TEXT NOT NULL, columns TEXT NOT NULL DEFAULT '[]', index_columns TEXT NOT NULL DEFAULT '[]', "
+        "refresh_interval REAL, refreshed_at REAL, row_count INTEGER NOT NULL DEFAULT 0, "
+        "stale INTEGER NOT NULL DEFAULT 1, stale_since REAL NOT NULL DEFAULT 0, leased_until REAL NOT NULL DEFAULT 0)"
+    )
+
+
+def replica_name(spreadsheet_id, sheet_name):
+    return f"{spreadsheet_id}:{sheet_name}"
+
+
+def _table_name(name):
+    return "replica_" + hashlib.sha1(name.encode()).hexdigest()[:16]
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def infer_column_type(values):
+    """
+    SQLite affinity for a column from its non-empty cells
+    """
+    column_type = "INTEGER"
+    seen = False
+    for value in values:
+        if value is None or value == "":
+            continue
+        seen = True
+        if isinstance(value, bool) or isinstance(value, int):
+            continue
+        if isinstance(value, float):
+            column_type = "REAL"
+            continue
+        return "TEXT"
+    return column_type if seen else "TEXT"
+
+
+def _fetch_sheet(spreadsheet_id, sheet_name):
+    with sheets_service(readonly=True) as service:
+        result = service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=sheet_name,
+            valueRenderOption='UNFORMATTED_VALUE',
+            fields='values'
+        ).execute()
+    return result.get('values', [])
+
+
+def register_replica(spreadsheet_id, sheet_name, index_columns=None, refresh_interval=None):
+    """
+    Create a replica definition, or update the fields that are given and
+    differ from the stored ones; omitted fields keep their stored values.
+    Only a change of indexed columns marks the replica stale, since the
+    refresh schedule does not change its contents.
+    """
+    name = replica_name(spreadsheet_id, sheet_name)
+    conn = connect(REPLICA_DB)
+    try:
+        _init(conn)
+        existing = conn.execute(
+            "SELECT index_columns, refresh_interval FROM replicas WHERE name = ?", (name,)
+        ).fetchone()
+        index_json = json.dumps(sorted(index_columns)) if index_columns else None
+        if existing is None:
+            conn.execute(
+                "INSERT INTO replicas (name, spreadsheet_id, sheet_name, table_name, index_columns, refresh_interval) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (name, spreadsheet_id, sheet_name, _table_name(name), index_json or '[]', refresh_interval)
+            )
+        else:
+            if index_json is not None and existing[0] != index_json:
+                conn.execute(
+                    "UPDATE replicas SET index_columns = ?, stale = 1 WHERE name = ?", (index_json, name)
+                )
+            if refresh_interval is not None and existing[1] != refresh_interval:
+                conn.execute("UPDATE replicas SET refresh_interval = ? WHERE name = ?", (refresh_interval, name))
+        conn.commit()
+    finally:
+        conn.close()
+    ensure_scheduler()
+    return name
+
+
+def get_replica(spreadsheet_id, sheet_name):
+    conn = connect(REPLICA_DB)
+    try:
+        _init(conn)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT * FROM replicas WHERE name = ?", (replica_name(spreadsheet_id, sheet_name),)
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _acquire_lease(conn, name, force):
+    now = time.time()
+    cursor = conn.execute(
+        "UPDATE replicas SET leased_until = ? WHERE name = ? AND (leased_until < ? OR ?)",
+        (now + REFRESH_LEASE_SECONDS, name, now, 1 if force else 0)
+    )
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def refresh_replica(spreadsheet_id, sheet_name, force=False):
+    """
+    Mirror the sheet into a fresh table and swap it in atomically, so queries
+    never see a half-loaded replica. Returns False if another worker holds the
+    refresh lease.
+    """
+    name = replica_name(spreadsheet_id, sheet_name)
+    conn = connect(REPLICA_DB)
+    try:
+        _init(conn)
+        replica = conn.execute(
+            "SELECT table_name, index_columns FROM replicas WHERE name = ?", (name,)
+        ).fetchone()
+        if replica is None:
+            raise ValueError(f"No replica registered for {name}")
+        if not _acquire_lease(conn, name, force):
+            return False
+        table_name, index_columns = replica[0], json.loads(replica[1])
+        started_at = time.time()
+        values = _fetch_sheet(spreadsheet_id, sheet_name)
+        header = values[0] if values else []
+        columns = _unique_headers(header)
+        data_rows = values[1:]
+        missing = [column for column in index_columns if column not in columns]
+        if missing:
+            raise ValueError(f"Index columns not found in sheet headers: {missing}")
+        column_types = [infer_column_type(row[i] if i < len(row) else None for row in data_rows) for i in range(len(columns))]
+        loading_table = f"{table_name}_loading"
+        column_defs = ", ".join(f"{_quote_identifier(c)} {t}" for c, t in zip(columns, column_types)) or "_empty TEXT"
+        conn.execute(f"DROP TABLE IF EXISTS {loading_table}")
+        conn.execute(f"CREATE TABLE {loading_table} (_row_number INTEGER PRIMARY KEY, {column_defs})")
+        if columns:
+            placeholders = ", ".join("?" * (len(columns) + 1))
+            conn.executemany(
+                f"INSERT INTO {loading_table} VALUES ({placeholders})",
+                (
+                    [row_number] + [
+                        (None if row[i] == "" else row[i]) if i < len(row) else None for i in range(len(columns))
+                    ]
+                    for row_number, row in enumerate(data_rows, start=2)
+                )
+            )
+        for column in index_columns:
+            # Index names outlive the rename, so make them unique per load
+            index_name = f"{table_name}_idx_{hashlib.sha1(column.encode()).hexdigest()[:8]}_{int(started_at * 1000)}"
+            conn.execute(f"CREATE INDEX {index_name} ON {loading_table} ({_quote_identifier(column)})")
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        conn.execute(f"ALTER TABLE {loading_table} RENAME TO {table_name}")
+        # A write during the fetch leaves the replica stale for the next round
+        conn.execute(
+            "UPDATE replicas SET columns = ?, refreshed_at = ?, row_count = ?, leased_until = 0, "
+            "stale = CASE WHEN stale_since > ? THEN 1 ELSE 0 END WHERE name = ?",
+            (json.dumps(columns), started_at, len(data_rows), started_at, name)
+        )
+        conn.commit()
+        logger.info(f"Refreshed replica {name}: {len(data_rows)} rows")
+        return True
+    except Exception:
+        conn.rollback()
+        conn.execute("UPDATE replicas SET leased_until = 0 WHERE name = ?", (name,))
+        conn.commit()
+        raise
+    finally:
+        conn.close()
+
+
+def mark_replicas_stale(spreadsheet_id):
+    """
+    Called after the connector writes to a spreadsheet
+    """
+    if not os.path.exists(get_data_path(REPLICA_DB)):
+        return
+    conn = connect(REPLICA_DB)
+    try:
+        _init(conn)
+        cursor = conn.execute(
+            "UPDATE replicas SET stale = 1, stale_since = ? WHERE spreadsheet_id = ?",
+            (time.time(), spreadsheet_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    if cursor.rowcount:
+        # This worker may not have served a query since it started
+        ensure_scheduler()
+
+
+def _authorizer(allowed_tables):
+    def authorize(action, arg1, arg2, db_name, trigger):
+        if action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION):
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_READ and arg1 in allowed_tables:
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+    return authorize
+
+
+def query_replica(replica, sql, params=None, max_rows=REPLICA_MAX_ROWS):
+    """
+    Run a read-only SELECT against a replica, exposed to the query as `sheet`
+    """
+    conn = sqlite3.connect(f"file:{get_data_path(REPLICA_DB)}?mode=ro", uri=True, timeout=30)
+    try:
+        table_name = replica["table_name"]
+        conn.execute(f"CREATE TEMP VIEW {QUERY_TABLE} AS SELECT * FROM main.{table_name}")
+        conn.set_authorizer(_authorizer({table_name, QUERY_TABLE}))
+        try:
+            cursor = conn.execute(sql, params or [])
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"Invalid query: {e}")
+        columns = [description[0] for description in cursor.description or []]
+        rows = cursor.fetchmany(max_rows + 1)
+        truncated = len(rows) > max_rows
+        return columns, [list(row) for row in rows[:max_rows]], truncated
+    finally:
+        conn.close()
+
+
+def _due_replicas():
+    conn = connect(REPLICA_DB)
+    try:
+        _init(conn)
+        now = time.time()
+        return conn.execute(
+            "SELECT spreadsheet_id, sheet_name FROM replicas WHERE leased_until < ? AND "
+            "(stale = 1 OR (refresh_interval IS NOT NULL AND refreshed_at + refresh_interval < ?))",
+            (now, now)
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _run_scheduler():
+    while True:
+        try:
+            for spreadsheet_id, sheet_name in _due_replicas():
+                try:
+                    refresh_replica(spreadsheet_id, sheet_name)
+                except Exception as e:
+                    logger.error(f"Scheduled refresh of replica {spreadsheet_id}:{sheet_name} failed: {e}")
+        except Exception as e:
+            logger.error(f"Replica scheduler error: {e}")
+        time.sleep(SCHEDULER_INTERVAL_SECONDS)
+
+
+def ensure_scheduler():
+    """
+    Start this process's refresh thread unless it is already running. Cheap
+    enough to call on every query.
+    """
+    with _scheduler_lock:
+        thread = _scheduler["thread"]
+        if thread is not None and thread.is_alive() and _scheduler["pid"] == os.getpid():
+            return
+        _scheduler["pid"] = os.getpid()
+        _scheduler["thread"] = threading.Thread(target=_run_scheduler, name="replica-scheduler", daemon=True)
+        _scheduler["thread"].start()
+
+
+def ensure_scheduler_if_registered():
+    """
+    Start the refresh thread when replicas were registered by an earlier
+    process, so a restarted worker keeps them refreshed before its first query.
+    """
+    if not os.path.exists(get_data_path(REPLICA_DB)):
+        return
+    try:
+        conn = connect(REPLICA_DB)
+        try:
+            _init(conn)
+            registered = conn.execute("SELECT 1 FROM replicas LIMIT 1").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Failed to read registered replicas: {e}")
+        return
+    if registered:
+        ensure_scheduler()
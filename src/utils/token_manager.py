@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import calendar
+import datetime
+import threading
+from contextlib import contextmanager
+
+import google.auth.transport.requests
+
+logger = logging.getLogger(__name__)
+
+TOKEN_STORE_PATH = os.environ.get("SHEETS_TOKEN_STORE_PATH", "/tmp/google_sheets_tokens.json")
+# Refresh this many seconds before expiry. Must stay above google-auth's own
+# refresh threshold (~225s) so request threads never see an invalid token.
+REFRESH_MARGIN_SECONDS = int(os.environ.get("SHEETS_TOKEN_REFRESH_MARGIN", "600"))
+RETRY_DELAY_SECONDS = 30
+TOKEN_MANAGER_ENABLED = os.environ.get("SHEETS_TOKEN_MANAGER_ENABLED", "true").lower() == "true"
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def _expiry_to_timestamp(expiry):
+    if expiry is None:
+        return None
+    return calendar.timegm(expiry.utctimetuple())
+
+
+def _timestamp_to_expiry(timestamp):
+    # google-auth compares against naive UTC datetimes
+    return datetime.datetime.utcfromtimestamp(timestamp)
+
+
+class SharedTokenStore:
+    """
+    JSON file of access tokens shared by every worker process on the host.
+    Reads and writes are serialized with an flock on a sidecar lock file.
+    """
+
+    def __init__(self, path=TOKEN_STORE_PATH):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    @contextmanager
+    def locked(self, exclusive=True):
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_all(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_all(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key, lock=True):
+        if not lock:
+            return self._read_all().get(key)
+        with self.locked(exclusive=False):
+            return self._read_all().get(key)
+
+    def put(self, key, token, expiry_ts, lock=True):
+        if not lock:
+            entries = self._read_all()
+            now = time.time()
+            entries = {k: v for k, v in entries.items() if v.get("expiry", 0) > now}
+            entries[key] = {"token": token, "expiry": expiry_ts}
+            self._write_all(entries)
+            return
+        with self.locked():
+            self.put(key, token, expiry_ts, lock=False)
+
+
+class TokenManager:
+    """
+    Keeps one credentials object's access token fresh from a background thread.
+
+    The token exchange happens under the store's exclusive lock, so when several
+    workers wake up at the same time only the first one talks to the token
+    endpoint and the others adopt the token it wrote. The endpoint is whatever
+    `token_uri` the service account info points at, and `request_factory` can
+    swap the HTTP transport, which is enough to run it against a local fake.
+    """
+
+    def __init__(self, credentials, key, store=None, refresh_margin=REFRESH_MARGIN_SECONDS, request_factory=None):
+        self.credentials = credentials
+        self.key = key
+        self.store = store or SharedTokenStore()
+        self.refresh_margin = refresh_margin
+        self.request_factory = request_factory or google.auth.transport.requests.Request
+        self.stats = {"refreshes": 0, "adopted": 0, "failures": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _seconds_left(self):
+        expiry_ts = _expiry_to_timestamp(self.credentials.expiry)
+        if not self.credentials.token or expiry_ts is None:
+            return 0
+        return expiry_ts - time.time()
+
+    def _adopt(self, entry):
+        if not entry or entry.get("expiry", 0) - time.time() <= self.refresh_margin:
+            return False
+        self.credentials.token = entry["token"]
+        self.credentials.expiry = _timestamp_to_expiry(entry["expiry"])
+        self.stats["adopted"] += 1
+        return True
+
+    def refresh_now(self):
+        with self._lock:
+            with self.store.locked():
+                if self._adopt(self.store.get(self.key, lock=False)):
+                    return
+                self.credentials.refresh(self.request_factory())
+                self.stats["refreshes"] += 1
+                self.store.put(self.key, self.credentials.token,
+                               _expiry_to_timestamp(self.credentials.expiry), lock=False)
+            logger.debug(f"Refreshed access token for {self.key}")
+
+    def ensure_token(self):
+        # Request path: only does network I/O on a cold start or when the
+        # background thread has fallen behind and the token has expired.
+        self.start()
+        if self._seconds_left() > 0:
+            return
+        if self._adopt(self.store.get(self.key)):
+            return
+        self.refresh_now()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            # Threads do not survive a fork, so each worker starts its own
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"token-refresh-{self.key}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            seconds_left = self._seconds_left()
+            wait = seconds_left - self.refresh_margin
+            if wait <= 0 and seconds_left > 0:
+                # Token lifetime shorter than the margin: refresh at half-life
+                wait = max(seconds_left / 2, 1)
+            if wait > 0 and self._stop.wait(wait):
+                return
+            try:
+                self.refresh_now()
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.error(f"Background token refresh failed for {self.key}: {e}")
+                if self._stop.wait(RETRY_DELAY_SECONDS):
+                    return
+
+
+def get_token_manager(credentials, key):
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None or manager.credentials is not credentials:
+            manager = TokenManager(credentials, key)
+            _managers[key] = manager
+        return manager
+
+
+def get_token_manager_stats():
+    with _managers_lock:
+        return {key: dict(manager.stats) for key, manager in _managers.items()}
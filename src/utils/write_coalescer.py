@@ -0,0 +1,129 @@
+import os
+import time
+import logging
+import threading
+
+from src.utils.google_sheets import column_letter, parse_a1_range
+
+logger = logging.getLogger(__name__)
+
+COALESCE_ENABLED = os.environ.get("SHEETS_INSERT_COALESCE_ENABLED", "false").lower() == "true"
+# How long the first request of a batch waits for others to join it
+COALESCE_WINDOW_MS = float(os.environ.get("SHEETS_INSERT_COALESCE_WINDOW_MS", "25"))
+COALESCE_MAX_ROWS = int(os.environ.get("SHEETS_INSERT_COALESCE_MAX_ROWS", "500"))
+
+
+def slice_updated_range(updated_range, row_offset, row_count):
+    """
+    The part of an append's updatedRange covering rows
+    [row_offset, row_offset + row_count) of the appended values
+    """
+    sheet_part, _, cells = updated_range.rpartition('!')
+    start_col, start_row, end_col, _ = parse_a1_range(cells)
+    first_row = start_row + row_offset
+    last_row = first_row + row_count - 1
+    cells = f"{column_letter(start_col)}{first_row}:{column_letter(end_col)}{last_row}"
+    return f"{sheet_part}!{cells}" if sheet_part else cells
+
+
+class _Batch:
+    def __init__(self):
+        self.parts = []
+        self.row_count = 0
+        self.sealed = False
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AppendCoalescer:
+    """
+    Merges concurrent appends with the same key into one API call.
+
+    The first caller for a key leads the batch: it waits up to the window (or
+    until the batch is full), then performs the append for everyone and hands
+    each caller the slice of updatedRange holding its rows. Coalescing only
+    spans threads of one worker process.
+    """
+
+    def __init__(self, window_ms=COALESCE_WINDOW_MS, max_rows=COALESCE_MAX_ROWS):
+        self.window_seconds = window_ms / 1000.0
+        self.max_rows = max_rows
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "coalesced_requests": 0}
+
+    def append(self, key, rows, do_append):
+        """
+        Queue rows under key. do_append(values) performs the real append and
+        returns its response. Returns (updated_range, batch_info).
+        """
+        rows = list(rows)
+        with self._lock:
+            self.stats["requests"] += 1
+            batch = self._pending.get(key)
+            if batch is not None and batch.row_count + len(rows) > self.max_rows:
+                # No room: let the current leader go now and start a new batch
+                self._seal(key, batch)
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._pending[key] = batch
+            else:
+                self.stats["coalesced_requests"] += 1
+            row_offset = batch.row_count
+            batch.parts.append(rows)
+            batch.row_count += len(rows)
+            if batch.row_count >= self.max_rows:
+                self._seal(key, batch)
+
+        if leader:
+            self._lead(key, batch, do_append)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        updated_range = batch.result.get("updates", {}).get("updatedRange", "")
+        batch_info = {"batch_requests": len(batch.parts), "batch_rows": batch.row_count}
+        if updated_range and rows:
+            updated_range = slice_updated_range(updated_range, row_offset, len(rows))
+        return updated_range, batch_info
+
+    def _seal(self, key, batch):
+        # Caller holds self._lock
+        batch.sealed = True
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        batch.full.set()
+
+    def _lead(self, key, batch, do_append):
+        batch.full.wait(self.window_seconds)
+        with self._lock:
+            if not batch.sealed:
+                self._seal(key, batch)
+            self.stats["batches"] += 1
+        try:
+            values = [row for part in batch.parts for row in part]
+            started = time.perf_counter()
+            batch.result = do_append(values)
+            logger.info(
+                f"Coalesced {len(batch.parts)} appends ({len(values)} rows) in "
+                f"{round((time.perf_counter() - started) * 1000, 2)}ms"
+            )
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["window_ms"] = self.window_seconds * 1000
+        stats["max_rows"] = self.max_rows
+        return stats
+
+
+append_coalescer = AppendCoalescer()
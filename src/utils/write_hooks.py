@@ -0,0 +1,27 @@
+import logging
+
+from src.utils.key_index_cache import key_index_cache, write_generations
+from src.utils.read_cache import read_cache
+from src.utils.sheet_metadata import metadata_cache
+from src.utils.sheet_replica import mark_replicas_stale
+
+logger = logging.getLogger(__name__)
+
+
+def notify_spreadsheet_written(spreadsheet_id):
+    """
+    Called by every write path after it touches a spreadsheet, successfully or
+    not, so local read state derived from it is dropped or refreshed. Returns
+    the spreadsheet's new write generation (None if it could not be recorded).
+    """
+    generation = write_generations.bump(spreadsheet_id)
+    key_index_cache.invalidate_spreadsheet(spreadsheet_id)
+    read_cache.invalidate_spreadsheet(spreadsheet_id)
+    # A write may have added or changed the header row
+    metadata_cache.invalidate_headers(spreadsheet_id)
+    try:
+        mark_replicas_stale(spreadsheet_id)
+    except Exception as e:
+        # Replicas also refresh on their schedule; never fail the write for this
+        logger.error(f"Failed to mark replicas stale for {spreadsheet_id}: {e}")
+    return generation
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from workflows_cdk import Response
+
+from src.utils.local_store import connect
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = "jobs.db"
+# Per gunicorn worker process
+JOB_WORKERS = int(os.environ.get("SHEETS_JOB_WORKERS", "4"))
+# Submissions are refused once this many jobs are waiting across all workers
+JOB_MAX_QUEUED = int(os.environ.get("SHEETS_JOB_MAX_QUEUED", "100"))
+# Queued jobs left by another (or a restarted) worker are picked up this often
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("SHEETS_JOB_POLL_INTERVAL", "2"))
+# How often to look for jobs orphaned by a worker that died
+JOB_RECOVERY_INTERVAL_SECONDS = 60
+# A running job's worker renews its lease every third of this; a job whose
+# lease has lapsed belongs to a worker that died
+JOB_LEASE_SECONDS = float(os.environ.get("SHEETS_JOB_LEASE_SECONDS", "60"))
+# Attempts at recording a job's final state before leaving it to lease expiry
+FINISH_ATTEMPTS = 3
+JOB_RETENTION_SECONDS = float(os.environ.get("SHEETS_JOB_RETENTION", str(7 * 24 * 3600)))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# The worker running the job died; the write may have been partially applied
+INTERRUPTED = "interrupted"
+FINISHED_STATES = (SUCCEEDED, FAILED, INTERRUPTED)
+
+_runners = {}
+# Jobs this process is running, whose leases it renews
+_active_jobs = set()
+_active_lock = threading.Lock()
+_dispatcher_lock = threading.Lock()
+_dispatcher = {"thread": None, "pid": None, "wake": threading.Event()}
+
+
+def _init(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+        "progress TEXT, result TEXT, error TEXT, owner_pid INTEGER, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+        "spreadsheet_id TEXT, leased_until REAL NOT NULL DEFAULT 0)"
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    # Job stores created before leases and per-spreadsheet ordering
+    if "spreadsheet_id" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN spreadsheet_id TEXT")
+    if "leased_until" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN leased_until REAL NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_spreadsheet ON jobs (spreadsheet_id, status)")
+
+
+def register_job_runner(kind, runner):
+    """
+    runner(payload, report_progress) performs the write and returns the result
+    dict; report_progress(dict) records partial progress for status polls.
+    Registering starts this worker's dispatcher, so jobs queued before a
+    restart are resumed once the modules are loaded again.
+    """
+    _runners[kind] = runner
+    ensure_dispatcher()
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job_id, kind, status, progress, result, error, created_at, started_at, finished_at = row
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "status": status,
+        "progress": json.loads(progress) if progress else None,
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at
+    }
+
+
+_JOB_COLUMNS = "job_id, kind, status, progress, result, error, created_at, started_at, finished_at"
+
+
+def submit_job(kind, payload):
+    if kind not in _runners:
+        raise ValueError(f"No job runner registered for {kind}")
+    conn = connect(JOBS_DB)
+    try:
+        _init(conn)
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        if queued >= JOB_MAX_QUEUED:
+            raise RuntimeError(f"Too many queued jobs ({queued}), retry later")
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, payload, status, created_at, spreadsheet_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), QUEUED, time.time(), payload.get("spreadsheet_id"))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    ensure_dispatcher()
+    _dispatcher["wake"].set()
+    return get_job(job_id)
+
+
+def get_job(job_id):
+    conn = connect(JOBS_DB)
+    try:
+        _init(conn)
+        return _row_to_job(conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def list_jobs(limit=50):
+    conn = connect(JOBS_DB)
+    try:
+        _init(conn)
+        rows = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def job_accepted_response(job):
+    """
+    202 Accepted with the job ID; clients poll the JOBS module for the outcome
+    """
+    return Response(
+        data={
+            "message": f"{job['kind']} job accepted",
+            "job_id": job["job_id"],
+            "status": job["status"]
+        },
+        metadata={"status": "accepted", "job_id": job["job_id"]},
+        status_code=202
+    )
+
+
+def _update_job(job_id, **fields):
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn = connect(JOBS_DB)
+    try:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", list(fields.values()) + [job_id])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _claim_next_job():
+    """
+    Oldest queued job whose spreadsheet has no running job and no older
+    queued job, so writes to one spreadsheet apply in submission order
+    """
+    if not _runners:
+        return None
+    conn = connect(JOBS_DB)
+    try:
+        _init(conn)
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        kinds = list(_runners)
+        row = conn.execute(
+            "SELECT job_id, kind, payload FROM jobs q WHERE status = ? "
+            f"AND kind IN ({', '.join('?' * len(kinds))}) "
+            "AND (spreadsheet_id IS NULL OR NOT EXISTS ("
+            "SELECT 1 FROM jobs p WHERE p.spreadsheet_id = q.spreadsheet_id "
+            "AND (p.status = ? OR (p.status = ? AND p.rowid < q.rowid)))) "
+            "ORDER BY rowid LIMIT 1",
+            [QUEUED] + kinds + [RUNNING, QUEUED]
+        ).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = ?, owner_pid = ?, started_at = ?, leased_until = ? WHERE job_id = ?",
+            (RUNNING, os.getpid(), now, now + JOB_LEASE_SECONDS, row[0])
+        )
+        conn.commit()
+        with _active_lock:
+            _active_jobs.add(row[0])
+        return row[0], row[1], json.loads(row[2])
+    finally:
+        conn.close()
+
+
+def _renew_leases():
+    with _active_lock:
+        job_ids = list(_active_jobs)
+    if not job_ids:
+        return
+    conn = connect(JOBS_DB)
+    try:
+        conn.execute(
+            f"UPDATE jobs SET leased_until = ? WHERE status = ? AND job_id IN ({', '.join('?' * len(job_ids))})",
+            [time.time() + JOB_LEASE_SECONDS, RUNNING] + job_ids
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def recover_jobs():
+    """
+    Running jobs whose lease has lapsed (their worker died, or a restarted
+    container reused its PID) are marked interrupted rather than re-run,
+    since their writes may already be partly applied. Queued jobs need
+    nothing: any worker's dispatcher picks them up. Old finished jobs are
+    pruned.
+    """
+    conn = connect(JOBS_DB)
+    try:
+        _init(conn)
+        now = time.time()
+        expired = conn.execute(
+            "SELECT job_id FROM jobs WHERE status = ? AND leased_until < ?", (RUNNING, now)
+        ).fetchall()
+        for (job_id,) in expired:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                (INTERRUPTED, "Worker stopped while the job was running; the write may be partially applied",
+                 now, job_id, RUNNING)
+            )
+            logger.error(f"Job {job_id} interrupted: its worker stopped renewing the lease")
+        conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATES))}) AND finished_at < ?",
+            FINISHED_STATES + (now - JOB_RETENTION_SECONDS,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _finish_job(job_id, **fields):
+    for attempt in range(1, FINISH_ATTEMPTS + 1):
+        try:
+            _update_job(job_id, finished_at=time.time(), **fields)
+            return
+        except Exception as e:
+            logger.error(f"Failed to record {fields['status']} for job {job_id} (attempt {attempt}): {e}")
+            time.sleep(attempt)
+    # No longer renewed, so recovery marks it interrupted once the lease lapses
+    logger.error(f"Giving up on recording the outcome of job {job_id}")
+
+
+def _run_job(job_id, kind, payload):
+    def report_progress(progress):
+        try:
+            _update_job(job_id, progress=json.dumps(progress))
+        except Exception as e:
+            logger.error(f"Failed to record progress for job {job_id}: {e}")
+
+    try:
+        try:
+            result = json.dumps(_runners[kind](payload, report_progress))
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) failed: {e}")
+            _finish_job(job_id, status=FAILED, error=str(e))
+            return
+        _finish_job(job_id, status=SUCCEEDED, result=result)
+        logger.info(f"Job {job_id} ({kind}) succeeded")
+    finally:
+        with _active_lock:
+            _active_jobs.discard(job_id)
+        # A job for the same spreadsheet may have been waiting on this one
+        _dispatcher["wake"].set()
+
+
+def _run_dispatcher(wake):
+    executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="write-job")
+    slots = threading.BoundedSemaphore(JOB_WORKERS)
+    last_recovery = 0
+    last_renewal = 0
+    while True:
+        if time.monotonic() - last_renewal > JOB_LEASE_SECONDS / 3:
+            last_renewal = time.monotonic()
+            try:
+                _renew_leases()
+            except Exception as e:
+                logger.error(f"Job lease renewal failed: {e}")
+        if time.monotonic() - last_recovery > JOB_RECOVERY_INTERVAL_SECONDS:
+            last_recovery = time.monotonic()
+            try:
+                recover_jobs()
+            except Exception as e:
+                logger.error(f"Job recovery failed: {e}")
+        # Time out so leases are still renewed while every slot is busy
+        if not slots.acquire(timeout=JOB_POLL_INTERVAL_SECONDS):
+            continue
+        try:
+            claimed = _claim_next_job()
+        except Exception as e:
+            logger.error(f"Job dispatcher error: {e}")
+            claimed = None
+        if claimed is None:
+            slots.release()
+            wake.wait(JOB_POLL_INTERVAL_SECONDS)
+            wake.clear()
+            continue
+        future = executor.submit(_run_job, *claimed)
+        future.add_done_callback(lambda _: slots.release())
+
+
+def ensure_dispatcher():
+    with _dispatcher_lock:
+        thread = _dispatcher["thread"]
+        if thread is not None and thread.is_alive() and _dispatcher["pid"] == os.getpid():
+            return
+        _dispatcher["pid"] = os.getpid()
+        _dispatcher["wake"] = threading.Event()
+        _dispatcher["thread"] = threading.Thread(
+            target=_run_dispatcher, args=(_dispatcher["wake"],), name="write-job-dispatcher", daemon=True
+        )
+        _dispatcher["thread"].start()
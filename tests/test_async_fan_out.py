@@ -0,0 +1,150 @@
+import time
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+from src.utils import async_sheets, fan_out
+from src.utils.async_sheets import AsyncSheetsClient
+from src.utils.fan_out import iter_fan_out_async
+
+
+class _Credentials:
+    valid = True
+    token = "test-token"
+
+
+class FakeSheetsServer:
+    """
+    values.get on a local port: ids starting with "slow" answer after a
+    second, "missing" returns 404, anything else answers after 50ms
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = None
+        self._runner = None
+
+    async def _values_get(self, request):
+        spreadsheet_id = request.match_info["spreadsheet_id"]
+        self.calls.append(spreadsheet_id)
+        if request.headers.get("Authorization") != "Bearer test-token":
+            return web.json_response({"error": "unauthorized"}, status=401)
+        if spreadsheet_id == "missing":
+            return web.json_response({"error": {"code": 404, "message": "Requested entity was not found."}}, status=404)
+        await asyncio.sleep(1.0 if spreadsheet_id.startswith("slow") else 0.05)
+        return web.json_response({"values": [["id"], [spreadsheet_id]]})
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/v4/spreadsheets/{spreadsheet_id}/values/{range}", self._values_get)
+        self._runner = web.AppRunner(app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        threading.Thread(target=self._serve, name="fake-sheets", daemon=True).start()
+        self._ready.wait(5)
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class AsyncFanOutTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeSheetsServer()
+        base_url = cls.server.start()
+        cls.client = AsyncSheetsClient(readonly=True, base_url=base_url)
+        cls.patches = [
+            mock.patch.object(async_sheets, "get_access_credentials", lambda readonly=False: _Credentials()),
+            # Pacing is the quota scheduler's concern, not fan-out's
+            mock.patch.object(async_sheets, "SCHEDULER_ENABLED", False)
+        ]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        async_sheets.run_sync(cls.client.close(), timeout=5)
+        for patch in cls.patches:
+            patch.stop()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.calls.clear()
+
+    async def fetch(self, target):
+        result = await self.client.values_get(target["spreadsheet_id"], target["range"], fields="values")
+        return {"values": result["values"]}
+
+    def test_every_target_succeeds(self):
+        targets = [{"spreadsheet_id": f"sheet{i}", "range": "A1:B2"} for i in range(50)]
+        results = list(iter_fan_out_async(targets, self.fetch, target_timeout=10))
+
+        self.assertEqual(len(results), 50)
+        self.assertEqual([r for r in results if r["status"] != "success"], [])
+        for result in results:
+            self.assertEqual(result["values"], [["id"], [targets[result["index"]]["spreadsheet_id"]]])
+
+    def test_targets_run_concurrently(self):
+        targets = [{"spreadsheet_id": f"slow{i}", "range": "A1"} for i in range(10)]
+        started = time.monotonic()
+        results = list(iter_fan_out_async(targets, self.fetch, target_timeout=10))
+        elapsed = time.monotonic() - started
+
+        self.assertTrue(all(r["status"] == "success" for r in results))
+        self.assertLess(elapsed, 5)
+
+    def test_errors_and_timeouts_are_reported_per_target(self):
+        targets = [
+            {"spreadsheet_id": "sheet", "range": "A1"},
+            {"spreadsheet_id": "missing", "range": "A1"},
+            {"spreadsheet_id": "slow", "range": "A1"}
+        ]
+        results = {r["spreadsheet_id"]: r for r in iter_fan_out_async(targets, self.fetch, target_timeout=0.5)}
+
+        self.assertEqual(results["sheet"]["status"], "success")
+        self.assertEqual(results["missing"]["status"], "error")
+        self.assertEqual(results["slow"]["error_class"], "timeout")
+
+    def test_open_circuit_does_not_reserve_quota(self):
+        reserved = []
+
+        async def reserve_quota(spreadsheet_id, kind):
+            reserved.append(spreadsheet_id)
+
+        def check(spreadsheet_id):
+            if spreadsheet_id == "broken":
+                return {"state": "open", "reason": "test", "message": "Circuit open"}
+            return None
+
+        targets = [{"spreadsheet_id": "broken", "range": "A1"}, {"spreadsheet_id": "sheet", "range": "A1"}]
+        with mock.patch.object(fan_out, "reserve_quota", reserve_quota), \
+                mock.patch.object(fan_out.circuit_breaker, "check", check):
+            results = {r["spreadsheet_id"]: r for r in iter_fan_out_async(targets, self.fetch, target_timeout=10)}
+
+        self.assertEqual(results["broken"]["error_class"], "circuit_open")
+        self.assertEqual(results["sheet"]["status"], "success")
+        self.assertEqual(reserved, ["sheet"])
+        self.assertNotIn("broken", self.server.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
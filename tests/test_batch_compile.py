@@ -0,0 +1,53 @@
+import unittest
+
+from src.modules.BATCH.v1.route import compile_operations, parse_operations, to_row_data
+
+HEADERS = {"Sheet1": ["id", "name"]}
+SHEET_IDS = {"Sheet1": 0}
+
+
+def compile_batch(operations, key_to_row=None):
+    operations = parse_operations(operations)
+    key_indexes = {("Sheet1", "id"): dict(key_to_row or {})}
+    return compile_operations(operations, SHEET_IDS, HEADERS, key_indexes)
+
+
+def appended_rows(requests):
+    return [row for request in requests if "appendCells" in request for row in request["appendCells"]["rows"]]
+
+
+class CompileOperationsTest(unittest.TestCase):
+    def test_upsert_updates_row_inserted_earlier_in_batch(self):
+        requests, results = compile_batch([
+            {"op": "insert", "sheet_name": "Sheet1", "rows": [{"id": "new", "name": "first"}]},
+            {"op": "upsert", "sheet_name": "Sheet1", "key_column": "id", "rows": [{"id": "new", "name": "second"}]}
+        ])
+
+        self.assertEqual(appended_rows(requests), [to_row_data(["new", "second"])])
+        self.assertEqual(results[1]["updated"], 1)
+        self.assertEqual(results[1]["inserted"], 0)
+
+    def test_upsert_of_same_new_key_twice_appends_once(self):
+        requests, results = compile_batch([
+            {"op": "upsert", "sheet_name": "Sheet1", "key_column": "id", "rows": [{"id": "new", "name": "first"}]},
+            {"op": "upsert", "sheet_name": "Sheet1", "key_column": "id", "rows": [{"id": "new", "name": "second"}]}
+        ])
+
+        self.assertEqual(appended_rows(requests), [to_row_data(["new", "second"])])
+        self.assertEqual([r["inserted"] for r in results], [1, 0])
+
+    def test_existing_row_is_updated_in_place(self):
+        requests, results = compile_batch([
+            {"op": "delete", "sheet_name": "Sheet1", "row_numbers": "2"},
+            {"op": "upsert", "sheet_name": "Sheet1", "key_column": "id", "rows": [{"id": "old", "name": "x"}]}
+        ], key_to_row={"old": 5})
+
+        update = next(request["updateCells"] for request in requests if "updateCells" in request)
+        # Row 5 moved up one after row 2 was deleted
+        self.assertEqual(update["start"]["rowIndex"], 3)
+        self.assertEqual(appended_rows(requests), [])
+        self.assertEqual(results[1]["updated"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
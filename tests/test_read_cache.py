@@ -0,0 +1,96 @@
+import threading
+import unittest
+
+from src.utils.read_cache import ReadCache
+
+
+class ReadCacheInvalidationTest(unittest.TestCase):
+    def test_read_after_write_does_not_join_earlier_fetch(self):
+        cache = ReadCache(ttl=0)
+        key = ("spreadsheet", "Sheet1!A1:B2")
+        started = threading.Event()
+        release = threading.Event()
+        results = {}
+
+        def blocked_fetch():
+            started.set()
+            release.wait(5)
+            return "before write"
+
+        def first_reader():
+            results["first"] = cache.get_or_fetch(key, blocked_fetch)
+
+        reader = threading.Thread(target=first_reader)
+        reader.start()
+        self.assertTrue(started.wait(5))
+
+        cache.invalidate_spreadsheet("spreadsheet")
+        second = cache.get_or_fetch(key, lambda: "after write")
+        release.set()
+        reader.join(5)
+
+        self.assertEqual(second, ("after write", "miss"))
+        self.assertEqual(results["first"], ("before write", "miss"))
+
+    def test_concurrent_reads_still_coalesce(self):
+        cache = ReadCache(ttl=0)
+        key = ("spreadsheet", "Sheet1")
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def blocked_fetch():
+            started.set()
+            release.wait(5)
+            return "value"
+
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_fetch(key, blocked_fetch)))
+        leader.start()
+        self.assertTrue(started.wait(5))
+        follower = threading.Thread(target=lambda: results.append(cache.get_or_fetch(key, lambda: "other")))
+        follower.start()
+        while cache.get_stats()["coalesced"] == 0:
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(sorted(results), [("value", "coalesced"), ("value", "miss")])
+
+    def test_stale_flight_does_not_remove_newer_flight(self):
+        cache = ReadCache(ttl=0)
+        key = ("spreadsheet", "Sheet1")
+        old_started = threading.Event()
+        old_release = threading.Event()
+        new_started = threading.Event()
+        new_release = threading.Event()
+
+        def old_fetch():
+            old_started.set()
+            old_release.wait(5)
+            return "old"
+
+        def new_fetch():
+            new_started.set()
+            new_release.wait(5)
+            return "new"
+
+        old = threading.Thread(target=lambda: cache.get_or_fetch(key, old_fetch))
+        old.start()
+        self.assertTrue(old_started.wait(5))
+        cache.invalidate_spreadsheet("spreadsheet")
+        new = threading.Thread(target=lambda: cache.get_or_fetch(key, new_fetch))
+        new.start()
+        self.assertTrue(new_started.wait(5))
+        old_release.set()
+        old.join(5)
+
+        # The newer flight is still joinable after the older one finished
+        self.assertEqual(len(cache._inflight), 1)
+        new_release.set()
+        new.join(5)
+        self.assertEqual(cache._inflight, {})
+
+
+if __name__ == "__main__":
+    unittest.main()